@@ -0,0 +1,47 @@
+"""Add video position and playlist schedule settings
+
+Revision ID: 07a3dcbbf033
+Revises: 425f38a42e4d
+Create Date: 2026-10-18 13:20:51.772310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '07a3dcbbf033'
+down_revision: Union[str, Sequence[str], None] = '425f38a42e4d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('videos', sa.Column('position', sa.Integer(), nullable=True))
+    # Existing videos were inserted in playlist order
+    op.execute(
+        "UPDATE videos SET position = ("
+        "SELECT COUNT(*) FROM videos AS earlier "
+        "WHERE earlier.playlist_id = videos.playlist_id AND earlier.id < videos.id)"
+    )
+    op.create_index('ix_videos_playlist_position', 'videos', ['playlist_id', 'position'], unique=False)
+
+    op.add_column('playlists', sa.Column('schedule_mode', sa.String(), nullable=True))
+    op.add_column('playlists', sa.Column('schedule_hours_per_day', sa.Float(), nullable=True))
+    op.add_column('playlists', sa.Column('schedule_start_date', sa.DateTime(), nullable=True))
+    op.add_column('playlists', sa.Column('schedule_end_date', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('playlists') as batch_op:
+        batch_op.drop_column('schedule_end_date')
+        batch_op.drop_column('schedule_start_date')
+        batch_op.drop_column('schedule_hours_per_day')
+        batch_op.drop_column('schedule_mode')
+    op.drop_index('ix_videos_playlist_position', table_name='videos')
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('position')
@@ -0,0 +1,32 @@
+"""Add indexes for calendar and dashboard queries
+
+Revision ID: 425f38a42e4d
+Revises: fa38c8bd0d3d
+Create Date: 2026-10-18 11:48:03.927114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '425f38a42e4d'
+down_revision: Union[str, Sequence[str], None] = 'fa38c8bd0d3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_videos_playlist_status', 'videos', ['playlist_id', 'status'], unique=False)
+    op.create_index('ix_videos_playlist_scheduled', 'videos', ['playlist_id', 'scheduled_date'], unique=False)
+    op.create_index(op.f('ix_playlists_owner_id'), 'playlists', ['owner_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_playlists_owner_id'), table_name='playlists')
+    op.drop_index('ix_videos_playlist_scheduled', table_name='videos')
+    op.drop_index('ix_videos_playlist_status', table_name='videos')
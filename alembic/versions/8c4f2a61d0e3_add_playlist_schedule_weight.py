@@ -0,0 +1,29 @@
+"""Add playlist schedule weight
+
+Revision ID: 8c4f2a61d0e3
+Revises: 5b1e7c2d9f40
+Create Date: 2026-10-18 15:41:09.603127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4f2a61d0e3'
+down_revision: Union[str, Sequence[str], None] = '5b1e7c2d9f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('playlists', sa.Column('schedule_weight', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('playlists') as batch_op:
+        batch_op.drop_column('schedule_weight')
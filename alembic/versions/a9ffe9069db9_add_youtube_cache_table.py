@@ -0,0 +1,38 @@
+"""Add youtube_cache table
+
+Revision ID: a9ffe9069db9
+Revises: d9426972195e
+Create Date: 2026-10-18 10:12:40.311927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9ffe9069db9'
+down_revision: Union[str, Sequence[str], None] = 'd9426972195e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'youtube_cache',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('etag', sa.String(), nullable=True),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_youtube_cache_expires_at'), 'youtube_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_youtube_cache_expires_at'), table_name='youtube_cache')
+    op.drop_table('youtube_cache')
@@ -0,0 +1,51 @@
+"""Add playlist stats table
+
+Revision ID: b37d95e0c4a8
+Revises: 8c4f2a61d0e3
+Create Date: 2026-10-18 16:24:55.190384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b37d95e0c4a8'
+down_revision: Union[str, Sequence[str], None] = '8c4f2a61d0e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'playlist_stats',
+        sa.Column('playlist_id', sa.Integer(), nullable=False),
+        sa.Column('total_videos', sa.Integer(), nullable=True),
+        sa.Column('completed_videos', sa.Integer(), nullable=True),
+        sa.Column('total_seconds', sa.Integer(), nullable=True),
+        sa.Column('completed_seconds', sa.Integer(), nullable=True),
+        sa.Column('scheduled_start', sa.DateTime(), nullable=True),
+        sa.Column('scheduled_end', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['playlist_id'], ['playlists.id']),
+        sa.PrimaryKeyConstraint('playlist_id')
+    )
+    # Backfill from the videos table (same numbers as `python -m app.rebuild_stats`)
+    op.execute(
+        "INSERT INTO playlist_stats (playlist_id, total_videos, completed_videos, total_seconds, "
+        "completed_seconds, scheduled_start, scheduled_end) "
+        "SELECT playlists.id, COUNT(videos.id), "
+        "COALESCE(SUM(CASE WHEN videos.status = 'Completed' THEN 1 ELSE 0 END), 0), "
+        "COALESCE(SUM(videos.duration_seconds), 0), "
+        "COALESCE(SUM(CASE WHEN videos.status = 'Completed' THEN videos.duration_seconds ELSE 0 END), 0), "
+        "MIN(videos.scheduled_date), MAX(videos.scheduled_date) "
+        "FROM playlists LEFT OUTER JOIN videos ON videos.playlist_id = playlists.id "
+        "GROUP BY playlists.id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('playlist_stats')
@@ -0,0 +1,31 @@
+"""Add version and updated_at to playlist stats
+
+Revision ID: c81d4e2a7f93
+Revises: e5a1c7f39b26
+Create Date: 2026-10-18 18:02:37.406215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d4e2a7f93'
+down_revision: Union[str, Sequence[str], None] = 'e5a1c7f39b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('playlist_stats', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('playlist_stats', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('playlist_stats') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
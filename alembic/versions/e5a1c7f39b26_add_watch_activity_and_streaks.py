@@ -0,0 +1,52 @@
+"""Add watch activity and streak tables
+
+Revision ID: e5a1c7f39b26
+Revises: b37d95e0c4a8
+Create Date: 2026-10-18 17:06:12.845519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c7f39b26'
+down_revision: Union[str, Sequence[str], None] = 'b37d95e0c4a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('videos', sa.Column('completed_at', sa.DateTime(), nullable=True))
+    op.create_table(
+        'watch_activity',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('playlist_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('videos_completed', sa.Integer(), nullable=True),
+        sa.Column('seconds_completed', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'playlist_id', 'day')
+    )
+    op.create_table(
+        'watch_streaks',
+        sa.Column('playlist_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('current_streak', sa.Integer(), nullable=True),
+        sa.Column('max_streak', sa.Integer(), nullable=True),
+        sa.Column('last_day', sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('playlist_id', 'user_id')
+    )
+    # Existing completions are filled in by `python -m app.backfill_streaks`
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('watch_streaks')
+    op.drop_table('watch_activity')
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('completed_at')
@@ -0,0 +1,82 @@
+"""Move video metadata to shared video_catalog
+
+Revision ID: fa38c8bd0d3d
+Revises: a9ffe9069db9
+Create Date: 2026-10-18 11:02:15.604218
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fa38c8bd0d3d'
+down_revision: Union[str, Sequence[str], None] = 'a9ffe9069db9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VIDEO_ID_RE = re.compile(r"[?&]v=([A-Za-z0-9_-]+)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'video_catalog',
+        sa.Column('youtube_id', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('thumbnail', sa.String(), nullable=True),
+        sa.Column('youtube_url', sa.String(), nullable=True),
+        sa.Column('duration_seconds', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('youtube_id')
+    )
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('catalog_id', sa.String(), nullable=True))
+
+    # Existing rows only carry the watch URL, so the video id is parsed from it.
+    # Rows imported before youtube_url existed get a per-row "legacy-<id>" entry
+    # so their title and thumbnail are kept.
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, youtube_url FROM videos")).fetchall()
+    updates = []
+    for video_id, url in rows:
+        match = VIDEO_ID_RE.search(url or "")
+        catalog_id = match.group(1) if match else f"legacy-{video_id}"
+        updates.append({"id": video_id, "catalog_id": catalog_id})
+    if updates:
+        bind.execute(sa.text("UPDATE videos SET catalog_id = :catalog_id WHERE id = :id"), updates)
+
+    op.execute(
+        "INSERT INTO video_catalog (youtube_id, title, thumbnail, youtube_url, duration_seconds) "
+        "SELECT catalog_id, MIN(title), MIN(thumbnail), MIN(youtube_url), MIN(duration_seconds) "
+        "FROM videos GROUP BY catalog_id"
+    )
+
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.create_foreign_key('fk_videos_catalog_id', 'video_catalog', ['catalog_id'], ['youtube_id'])
+        batch_op.drop_column('title')
+        batch_op.drop_column('thumbnail')
+        batch_op.drop_column('youtube_url')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('title', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('youtube_url', sa.String(), nullable=True))
+
+    op.execute(
+        "UPDATE videos SET "
+        "title = (SELECT title FROM video_catalog WHERE youtube_id = videos.catalog_id), "
+        "thumbnail = (SELECT thumbnail FROM video_catalog WHERE youtube_id = videos.catalog_id), "
+        "youtube_url = (SELECT youtube_url FROM video_catalog WHERE youtube_id = videos.catalog_id) "
+        "WHERE catalog_id IS NOT NULL"
+    )
+
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_constraint('fk_videos_catalog_id', type_='foreignkey')
+        batch_op.drop_column('catalog_id')
+    op.drop_table('video_catalog')
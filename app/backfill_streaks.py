@@ -0,0 +1,79 @@
+# backfill_streaks.py
+# Builds watch_activity and watch_streaks for completions recorded before they existed.
+#   python -m app.backfill_streaks
+# Completed videos without completed_at are stamped with their scheduled date (the day the
+# old streak endpoint assumed they were watched), added to watch_activity, and every streak
+# is then recomputed from watch_activity. Running it again changes nothing.
+import asyncio
+from collections import defaultdict
+from itertools import groupby
+from sqlalchemy import select, update, delete, insert
+from app import crud, models
+from app.database import AsyncSessionLocal
+from app.streaks import ALL_PLAYLISTS, streak_from_days
+
+
+async def backfill():
+    async with AsyncSessionLocal() as db:
+        legacy = (await db.execute(
+            select(models.Video.id, models.Video.playlist_id, models.Playlist.owner_id,
+                   models.Video.duration_seconds, models.Video.scheduled_date)
+            .join(models.Playlist, models.Video.playlist_id == models.Playlist.id)
+            .where(
+                models.Video.status == crud.COMPLETED,
+                models.Video.completed_at == None,
+                models.Video.scheduled_date != None,
+            )
+        )).all()
+
+        activity = defaultdict(lambda: [0, 0])
+        for video in legacy:
+            day = video.scheduled_date.date()
+            for scope in (video.playlist_id, ALL_PLAYLISTS):
+                counts = activity[(video.owner_id, scope, day)]
+                counts[0] += 1
+                counts[1] += video.duration_seconds or 0
+
+        for i in range(0, len(legacy), crud.INSERT_BATCH_SIZE):
+            await db.execute(update(models.Video), [
+                {"id": video.id, "completed_at": video.scheduled_date}
+                for video in legacy[i:i + crud.INSERT_BATCH_SIZE]
+            ])
+
+        table = models.WatchActivity
+        rows = [
+            {"user_id": user_id, "playlist_id": scope, "day": day,
+             "videos_completed": videos, "seconds_completed": seconds}
+            for (user_id, scope, day), (videos, seconds) in activity.items()
+        ]
+        for i in range(0, len(rows), crud.INSERT_BATCH_SIZE):
+            stmt = crud.dialect_insert(db, table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "playlist_id", "day"],
+                set_={
+                    "videos_completed": table.videos_completed + stmt.excluded.videos_completed,
+                    "seconds_completed": table.seconds_completed + stmt.excluded.seconds_completed,
+                },
+            )
+            await db.execute(stmt, rows[i:i + crud.INSERT_BATCH_SIZE])
+
+        # Recompute every streak from the full activity history
+        days = await db.execute(
+            select(table.user_id, table.playlist_id, table.day)
+            .order_by(table.user_id, table.playlist_id, table.day)
+        )
+        streaks = []
+        for (user_id, scope), group in groupby(days, key=lambda row: (row.user_id, row.playlist_id)):
+            current, best, last_day = streak_from_days(row.day for row in group)
+            streaks.append({"user_id": user_id, "playlist_id": scope, "current_streak": current,
+                            "max_streak": best, "last_day": last_day})
+        await db.execute(delete(models.WatchStreak))
+        for i in range(0, len(streaks), crud.INSERT_BATCH_SIZE):
+            await db.execute(insert(models.WatchStreak), streaks[i:i + crud.INSERT_BATCH_SIZE])
+        await db.commit()
+    return len(legacy), len(streaks)
+
+
+if __name__ == "__main__":
+    videos, streak_rows = asyncio.run(backfill())
+    print(f"{videos} completed videos backfilled, {streak_rows} streaks rebuilt")
@@ -1,40 +1,298 @@
-from datetime import datetime, timedelta
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from heapq import heapify, heappop, heappush
+from itertools import accumulate, count, groupby
+from operator import itemgetter
 
-def schedule_by_hours_per_day(videos, daily_hours: float, start_date: datetime):
-    daily_limit = daily_hours * 60 * 60  # convert hours to seconds
-    schedule = []
-    day_cursor = start_date
-    current_day_total = 0
 
-    for video in videos:
-        duration = video.duration_seconds
-        if current_day_total + duration > daily_limit:
-            # Move to next day
-            day_cursor += timedelta(days=1)
-            current_day_total = 0
+# Scheduling kernel: works on a compact sequence of durations (e.g. array('i') built from
+# an (id, duration_seconds) query) and returns the day offset of every video.
 
-        schedule.append((video.id, day_cursor))
-        current_day_total += duration
+def _prefix_sums(durations):
+    # A plain list: bisect over it is much faster than over an array of boxed ints
+    return [0, *accumulate(durations)]
+
+
+def _fill_days(day_ends, day_numbers=None):
+    # day_ends[k] is the index one past the last video of the k-th used day and
+    # day_numbers[k] its day offset (0, 1, 2, ... when omitted). A running sum of
+    # the day increments placed at each day start gives every video its offset.
+    n = day_ends[-1] if day_ends else 0
+    if day_numbers is None:
+        starts = bytearray(n)
+        for end in day_ends[:-1]:
+            starts[end] = 1
+        return array("i", accumulate(starts))
+
+    steps = array("i", bytes(4 * n))
+    if n:
+        steps[0] = day_numbers[0]
+    for k, end in enumerate(day_ends[:-1]):
+        steps[end] = day_numbers[k + 1] - day_numbers[k]
+    return array("i", accumulate(steps))
+
+
+def hours_day_offsets(durations, daily_limit: float):
+    # Greedy fill: a day takes videos until the next one would exceed the limit.
+    # A video longer than the limit gets a day to itself.
+    prefix = _prefix_sums(durations)
+    n = len(prefix) - 1
+    day_ends = []
+    i = 0
+    while i < n:
+        end = bisect_right(prefix, prefix[i] + daily_limit, i + 1) - 1
+        i = end if end > i else i + 1
+        day_ends.append(i)
+    return _fill_days(day_ends)
+
+
+class CapacityTimeline:
+    """Seconds of study time on each day from a start date.
+
+    Built from per-weekday hours (index 0 = Monday) and blackout dates.
+    Capacities are precomputed a year at a time, with running totals, so
+    a day or a range of days is a list index however far the plan reaches.
+    """
+
+    CHUNK_DAYS = 366
+
+    def __init__(self, start_date: date, weekday_hours, blackout_dates=()):
+        if len(weekday_hours) != 7:
+            raise ValueError("weekday_hours needs one value per weekday")
+        self.start_date = start_date
+        self.weekday_seconds = [int((hours or 0) * 60 * 60) for hours in weekday_hours]
+        self.blackouts = {(day - start_date).days for day in blackout_dates if day >= start_date}
+        self.days = array("i")
+        self.totals = array("q", [0])  # totals[i] = seconds on days 0 .. i - 1
+
+    def has_capacity(self):
+        return any(self.weekday_seconds)
+
+    def _extend(self):
+        first = len(self.days)
+        weekday = (self.start_date.weekday() + first) % 7
+        week = self.weekday_seconds
+        self.days.extend(
+            0 if offset in self.blackouts else week[(weekday + i) % 7]
+            for i, offset in enumerate(range(first, first + self.CHUNK_DAYS))
+        )
+        total = self.totals[-1]
+        for seconds in self.days[first:]:
+            total += seconds
+            self.totals.append(total)
+
+    def capacity(self, offset: int):
+        while offset >= len(self.days):
+            self._extend()
+        return self.days[offset]
+
+    def capacity_between(self, first: int, end: int):
+        # Seconds of study time on days first .. end - 1
+        if end <= first:
+            return 0
+        self.capacity(end - 1)
+        return self.totals[end] - self.totals[first]
+
+
+def capacity_day_offsets(durations, timeline: CapacityTimeline):
+    # Greedy fill of each day's capacity; days without capacity are skipped.
+    # A video longer than a day's capacity gets that day to itself.
+    if not timeline.has_capacity():
+        raise ValueError("No study time available on any weekday")
+    prefix = _prefix_sums(durations)
+    n = len(prefix) - 1
+    day_ends = []
+    day_numbers = []
+    day = 0
+    i = 0
+    while i < n:
+        capacity = timeline.capacity(day)
+        if capacity:
+            end = bisect_right(prefix, prefix[i] + capacity, i + 1) - 1
+            i = end if end > i else i + 1
+            day_ends.append(i)
+            day_numbers.append(day)
+        day += 1
+    return _fill_days(day_ends, day_numbers)
+
+
+def _min_max_daily_load(prefix, days: int):
+    # Smallest L such that the videos split into at most `days` contiguous days of load <= L.
+    # Binary search on L; each feasibility check jumps a whole day with bisect over prefix sums.
+    total = prefix[-1]
+    n = len(prefix) - 1
+    low = max(prefix[i + 1] - prefix[i] for i in range(n))
+    high = total
+    while low < high:
+        mid = (low + high) // 2
+        used_days = 0
+        i = 0
+        while i < n and used_days <= days:
+            i = bisect_right(prefix, prefix[i] + mid, i) - 1
+            used_days += 1
+        if used_days <= days:
+            high = mid
+        else:
+            low = mid + 1
+    return low
 
-    return schedule
+
+def target_day_offsets(durations, total_days: int):
+    # Split into exactly min(total_days, videos) contiguous days, minimizing the busiest day
+    prefix = _prefix_sums(durations)
+    n = len(prefix) - 1
+    if not n:
+        return array("i")
+    days = min(max(total_days, 1), n)
+    daily_limit = _min_max_daily_load(prefix, days)
+
+    day_ends = []
+    i = 0
+    while i < n:
+        end = bisect_right(prefix, prefix[i] + daily_limit, i + 1) - 1
+        end = end if end > i else i + 1
+        # Leave at least one video for every remaining day
+        days_after = days - len(day_ends) - 1
+        end = min(end, n - days_after)
+        day_ends.append(end)
+        i = end
+    return _fill_days(day_ends)
+
+
+def _to_schedule(video_ids, offsets, start_date: datetime):
+    dates = [start_date + timedelta(days=day) for day in range(offsets[-1] + 1)] if offsets else []
+    return [(video_id, dates[day]) for video_id, day in zip(video_ids, offsets)]
+
+
+def schedule_by_hours_per_day(videos, daily_hours: float, start_date: datetime):
+    videos = list(videos)
+    offsets = hours_day_offsets(array("i", [video.duration_seconds or 0 for video in videos]), daily_hours * 60 * 60)
+    return _to_schedule([video.id for video in videos], offsets, start_date)
 
 
 def schedule_by_target_date(videos, end_date: datetime, start_date: datetime):
-    total_duration = sum(video.duration_seconds for video in videos)
+    videos = list(videos)
     total_days = (end_date - start_date).days + 1
-    daily_limit = total_duration // total_days
+    offsets = target_day_offsets(array("i", [video.duration_seconds or 0 for video in videos]), total_days)
+    return _to_schedule([video.id for video in videos], offsets, start_date)
+
+
+def schedule_by_capacity(videos, timeline: CapacityTimeline):
+    videos = list(videos)
+    offsets = capacity_day_offsets(array("i", [video.duration_seconds or 0 for video in videos]), timeline)
+    start = datetime.combine(timeline.start_date, datetime.min.time())
+    return _to_schedule([video.id for video in videos], offsets, start)
+
+
+# One playlist in a user-level schedule: videos are (video_id, duration_seconds)
+# in playlist order, deadline is a day offset from the start date or None
+PlaylistLane = namedtuple("PlaylistLane", "playlist_id weight deadline videos")
+
+
+def interleave_playlists(lanes, timeline: CapacityTimeline):
+    """Merge several playlists into one watch order and fill the shared budget.
+
+    Weighted fair queueing: every lane has a virtual time that advances by
+    duration / weight, and the lane with the lowest one goes next. Lanes
+    that would miss their deadline at their fair share get their weight
+    boosted to the share of the remaining capacity they need. Ties go to
+    the earlier deadline, then round-robin. Each playlist keeps its own
+    order. Days are filled greedily as videos are picked, so deadline
+    checks see the real calendar. Returns (playlist_id, video_id, day
+    offset) tuples.
+    """
+    if not timeline.has_capacity():
+        raise ValueError("No study time available on any weekday")
+    total_weight = sum(lane.weight for lane in lanes if lane.videos) or 1
+    remaining = [sum(duration or 0 for _, duration in lane.videos) for lane in lanes]
+    vtime = [0.0] * len(lanes)
+    turn = count()
+    no_deadline = float("inf")
+
+    heap = [
+        (0.0, no_deadline if lane.deadline is None else lane.deadline, next(turn), index, 0)
+        for index, lane in enumerate(lanes) if lane.videos
+    ]
+    heapify(heap)
+
+    order = []
+    day = 0
+    while not timeline.capacity(day):
+        day += 1
+    used = 0
+    while heap:
+        _, deadline, _, index, position = heappop(heap)
+        lane = lanes[index]
+        video_id, duration = lane.videos[position]
+        duration = duration or 0
+        if used and used + duration > timeline.capacity(day):
+            day += 1
+            while not timeline.capacity(day):
+                day += 1
+            used = 0
+        used += duration
+        order.append((lane.playlist_id, video_id, day))
+        remaining[index] -= duration
+
+        weight = lane.weight
+        if lane.deadline is not None and remaining[index]:
+            # Share of the capacity left before the deadline this lane needs, keeping
+            # a day in hand: boosts apply one video late and days are not packed full
+            left_today = max(timeline.capacity(day) - used, 0)
+            seconds_left = left_today + timeline.capacity_between(day + 1, lane.deadline)
+            share = remaining[index] / seconds_left if seconds_left > 0 else 1
+            if share >= 1:
+                weight = no_deadline
+            else:
+                other_weight = total_weight - lane.weight
+                weight = max(weight, share * other_weight / (1 - share))
+        vtime[index] += duration / weight
+
+        if position + 1 < len(lane.videos):
+            heappush(heap, (vtime[index], deadline, next(turn), index, position + 1))
+    return order
+
+
+def schedule_user_playlists(lanes, timeline: CapacityTimeline):
+    # Returns ((video_id, date) pairs, {playlist_id: last scheduled date})
+    order = interleave_playlists(lanes, timeline)
+    start = datetime.combine(timeline.start_date, datetime.min.time())
+    dates = [start + timedelta(days=day) for day in range(order[-1][2] + 1)] if order else []
 
     schedule = []
-    day_cursor = start_date
-    current_day_total = 0
+    finish = {}
+    for playlist_id, video_id, day in order:
+        schedule.append((video_id, dates[day]))
+        finish[playlist_id] = dates[day]
+    return schedule, finish
 
-    for video in videos:
-        duration = video.duration_seconds
-        if current_day_total + duration > daily_limit:
-            day_cursor += timedelta(days=1)
-            current_day_total = 0
 
-        schedule.append((video.id, day_cursor))
-        current_day_total += duration
+def schedule_playlists(rows, settings):
+    """Schedule many playlists in one pass.
 
+    `rows` are (playlist_id, video_id, duration_seconds) tuples grouped by
+    playlist and in playlist order. `settings` maps playlist_id to an object
+    with the saved schedule_mode, schedule_hours_per_day, schedule_start_date
+    and schedule_end_date. Returns (video_id, date) pairs for every playlist
+    with a saved hours or target schedule.
+    """
+    schedule = []
+    for playlist_id, group in groupby(rows, key=itemgetter(0)):
+        playlist = settings.get(playlist_id)
+        if playlist is None or not playlist.schedule_mode:
+            continue
+        group = list(group)
+        durations = array("i", [duration or 0 for _, _, duration in group])
+        if playlist.schedule_mode == "hours":
+            offsets = hours_day_offsets(durations, playlist.schedule_hours_per_day * 60 * 60)
+        elif playlist.schedule_mode == "target":
+            total_days = (playlist.schedule_end_date - playlist.schedule_start_date).days + 1
+            offsets = target_day_offsets(durations, total_days)
+        else:
+            # "user" plans (all playlists together) are left as they are; "capacity" plans
+            # depend on the owner's availability and are replayed by crud.capacity_schedule
+            continue
+        schedule.extend(_to_schedule([video_id for _, video_id, _ in group], offsets, playlist.schedule_start_date))
     return schedule
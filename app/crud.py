@@ -0,0 +1,447 @@
+from sqlalchemy import func, case, update, insert, select, delete, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from app import models
+from app.calendar_logic import CapacityTimeline, schedule_by_capacity, schedule_playlists
+
+COMPLETED = "Completed"
+UNFINISHED = ("Not Started", "In Progress")
+INSERT_BATCH_SIZE = 1000
+
+
+def _stats_columns():
+    is_completed = models.Video.status == COMPLETED
+    return (
+        func.count(models.Video.id).label("total_videos"),
+        func.coalesce(func.sum(case((is_completed, 1), else_=0)), 0).label("completed_videos"),
+        func.coalesce(func.sum(models.Video.duration_seconds), 0).label("total_seconds"),
+        func.coalesce(
+            func.sum(case((is_completed, models.Video.duration_seconds), else_=0)), 0
+        ).label("completed_seconds"),
+        func.min(models.Video.scheduled_date).label("scheduled_start"),
+        func.max(models.Video.scheduled_date).label("scheduled_end"),
+    )
+
+
+STATS_FIELDS = (
+    "total_videos", "completed_videos", "total_seconds", "completed_seconds", "scheduled_start", "scheduled_end",
+)
+
+
+async def compute_playlist_stats(db: AsyncSession, playlist_ids: list[int]):
+    # Recomputes stats from the videos table; playlists without videos get zeros
+    result = await db.execute(
+        select(models.Video.playlist_id, *_stats_columns())
+        .where(models.Video.playlist_id.in_(playlist_ids))
+        .group_by(models.Video.playlist_id)
+    )
+    stats = {
+        playlist_id: dict.fromkeys(STATS_FIELDS, 0) | {"scheduled_start": None, "scheduled_end": None}
+        for playlist_id in playlist_ids
+    }
+    for row in result:
+        stats[row.playlist_id] = {field: getattr(row, field) for field in STATS_FIELDS}
+    return stats
+
+
+def dialect_insert(db: AsyncSession, model):
+    # INSERT with the ON CONFLICT clauses of the bound database (PostgreSQL or SQLite)
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+
+def _upsert(db: AsyncSession, model, key: str, fields, **values):
+    # `values` are SQL expressions set on conflict instead of the inserted value
+    stmt = dialect_insert(db, model)
+    return stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={field: stmt.excluded[field] for field in fields} | values,
+    )
+
+
+async def refresh_playlist_stats(db: AsyncSession, playlist_ids: list[int]):
+    # Part of the caller's transaction: no commit here. Also bumps the version.
+    playlist_ids = list(set(playlist_ids))
+    now = datetime.utcnow()
+    stats_table = models.PlaylistStats
+    for i in range(0, len(playlist_ids), INSERT_BATCH_SIZE):
+        stats = await compute_playlist_stats(db, playlist_ids[i:i + INSERT_BATCH_SIZE])
+        await db.execute(
+            _upsert(db, stats_table, "playlist_id", STATS_FIELDS + ("updated_at",), version=stats_table.version + 1),
+            [
+                {"playlist_id": playlist_id, **values, "version": 1, "updated_at": now}
+                for playlist_id, values in stats.items()
+            ],
+        )
+
+
+async def bump_playlist_versions(db: AsyncSession, playlist_ids):
+    # Marks the playlists' videos as changed (cached responses and ETags go stale), in the caller's transaction
+    if playlist_ids:
+        await db.execute(
+            update(models.PlaylistStats)
+            .where(models.PlaylistStats.playlist_id.in_(list(set(playlist_ids))))
+            .values(version=models.PlaylistStats.version + 1, updated_at=datetime.utcnow())
+        )
+
+
+async def playlist_version(db: AsyncSession, playlist_id: int):
+    # (version, updated_at) of one playlist, or None when it has no stats row
+    return (await db.execute(
+        select(models.PlaylistStats.version, models.PlaylistStats.updated_at)
+        .where(models.PlaylistStats.playlist_id == playlist_id)
+    )).first()
+
+
+async def user_playlist_versions(db: AsyncSession, owner_id: int):
+    # (id, version, updated_at) for every playlist of a user; version is None without a stats row
+    return (await db.execute(
+        select(models.Playlist.id, models.PlaylistStats.version, models.PlaylistStats.updated_at)
+        .outerjoin(models.PlaylistStats, models.PlaylistStats.playlist_id == models.Playlist.id)
+        .where(models.Playlist.owner_id == owner_id)
+        .order_by(models.Playlist.id)
+    )).all()
+
+
+async def apply_status_changes(db: AsyncSession, changes):
+    # Adjusts the completed counters in the caller's transaction. `changes` are
+    # (playlist_id, duration_seconds, old_status, new_status); one UPDATE per playlist touched.
+    deltas = {}
+    for playlist_id, duration_seconds, old_status, new_status in changes:
+        delta = (new_status == COMPLETED) - (old_status == COMPLETED)
+        if delta:
+            videos, seconds = deltas.get(playlist_id, (0, 0))
+            deltas[playlist_id] = (videos + delta, seconds + delta * (duration_seconds or 0))
+    deltas = {playlist_id: delta for playlist_id, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+
+    stored = set((await db.execute(
+        select(models.PlaylistStats.playlist_id).where(models.PlaylistStats.playlist_id.in_(list(deltas)))
+    )).scalars())
+    params = [
+        {"stats_playlist_id": playlist_id, "videos": videos, "seconds": seconds}
+        for playlist_id, (videos, seconds) in deltas.items() if playlist_id in stored
+    ]
+    if params:
+        stats = models.PlaylistStats.__table__
+        await db.execute(
+            update(stats)
+            .where(stats.c.playlist_id == bindparam("stats_playlist_id"))
+            .values(
+                completed_videos=stats.c.completed_videos + bindparam("videos"),
+                completed_seconds=stats.c.completed_seconds + bindparam("seconds"),
+            ),
+            params,
+        )
+    missing = [playlist_id for playlist_id in deltas if playlist_id not in stored]
+    if missing:
+        await refresh_playlist_stats(db, missing)
+
+
+async def apply_status_change(db: AsyncSession, playlist_id: int, duration_seconds: int, old_status: str, new_status: str):
+    await apply_status_changes(db, [(playlist_id, duration_seconds, old_status, new_status)])
+
+
+async def playlist_stats(db: AsyncSession, playlist_id: int):
+    # Primary-key lookup on playlist_stats; computed from videos if the row is missing
+    row = (await db.execute(
+        select(*(getattr(models.PlaylistStats, field) for field in STATS_FIELDS))
+        .where(models.PlaylistStats.playlist_id == playlist_id)
+    )).first()
+    if row is None:
+        return (await compute_playlist_stats(db, [playlist_id]))[playlist_id]
+    return row._asdict()
+
+
+async def user_playlist_stats(db: AsyncSession, owner_id: int):
+    # Stats for every playlist of a user, read from playlist_stats
+    stats = models.PlaylistStats
+    result = await db.execute(
+        select(
+            models.Playlist.id,
+            models.Playlist.title,
+            models.Playlist.youtube_url,
+            models.Playlist.thumbnail,
+            *(func.coalesce(getattr(stats, field), 0).label(field) for field in STATS_FIELDS[:4]),
+            stats.scheduled_start,
+            stats.scheduled_end,
+        )
+        .outerjoin(stats, stats.playlist_id == models.Playlist.id)
+        .where(models.Playlist.owner_id == owner_id)
+        .order_by(models.Playlist.id)
+    )
+    return [row._asdict() for row in result]
+
+
+STREAM_BATCH_SIZE = 500
+
+
+def _video_list_columns(include_notes: bool):
+    # Row columns for the video list endpoints; catalog fields come from one outer join
+    columns = [
+        models.Video.id,
+        models.CatalogVideo.title,
+        models.Video.scheduled_date,
+        models.Video.status,
+        models.Video.duration_seconds,
+        models.CatalogVideo.thumbnail,
+        models.CatalogVideo.youtube_url,
+    ]
+    if include_notes:
+        columns.append(models.Video.notes)
+    return columns
+
+
+def playlist_videos_query(playlist_id: int, include_notes: bool = True, after_id: int = None, limit: int = None):
+    # Keyset pagination on id: the next page starts after the last id returned
+    stmt = (
+        select(*_video_list_columns(include_notes))
+        .outerjoin(models.CatalogVideo, models.Video.catalog_id == models.CatalogVideo.youtube_id)
+        .where(models.Video.playlist_id == playlist_id)
+        .order_by(models.Video.id)
+    )
+    if after_id is not None:
+        stmt = stmt.where(models.Video.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def calendar_videos_query(playlist_id: int, include_notes: bool = True, start=None, end=None,
+                          after=None, limit: int = None):
+    # Keyset pagination on (scheduled_date, id); start/end bound the scheduled date (inclusive)
+    stmt = (
+        select(*_video_list_columns(include_notes))
+        .outerjoin(models.CatalogVideo, models.Video.catalog_id == models.CatalogVideo.youtube_id)
+        .where(models.Video.playlist_id == playlist_id, models.Video.scheduled_date != None)
+        .order_by(models.Video.scheduled_date, models.Video.id)
+    )
+    if start is not None:
+        stmt = stmt.where(models.Video.scheduled_date >= start)
+    if end is not None:
+        stmt = stmt.where(models.Video.scheduled_date <= end)
+    if after is not None:
+        after_date, after_id = after
+        stmt = stmt.where(
+            (models.Video.scheduled_date > after_date)
+            | ((models.Video.scheduled_date == after_date) & (models.Video.id > after_id))
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+async def schedulable_videos(db: AsyncSession, playlist_id: int):
+    # Only the columns the scheduler needs, in playlist order
+    result = await db.execute(
+        select(models.Video.id, models.Video.duration_seconds)
+        .where(models.Video.playlist_id == playlist_id)
+        .order_by(models.Video.position, models.Video.id)
+    )
+    return result.all()
+
+
+async def unfinished_videos(db: AsyncSession, playlist_id: int):
+    # Scheduler columns plus the current date, so unchanged rows can be skipped
+    result = await db.execute(
+        select(models.Video.id, models.Video.duration_seconds, models.Video.scheduled_date)
+        .where(models.Video.playlist_id == playlist_id, models.Video.status.in_(UNFINISHED))
+        .order_by(models.Video.position, models.Video.id)
+    )
+    return result.all()
+
+
+async def user_unfinished_videos(db: AsyncSession, playlist_ids: list[int]):
+    # (playlist_id, id, duration_seconds) rows grouped by playlist, in playlist order
+    result = await db.execute(
+        select(models.Video.playlist_id, models.Video.id, models.Video.duration_seconds)
+        .where(models.Video.playlist_id.in_(playlist_ids), models.Video.status.in_(UNFINISHED))
+        .order_by(models.Video.playlist_id, models.Video.position, models.Video.id)
+    )
+    return result.all()
+
+
+async def save_schedule(db: AsyncSession, schedule, playlist_ids=()):
+    # Write every (video_id, date) pair with one executemany UPDATE; the scheduled
+    # range of `playlist_ids` is refreshed in the same transaction
+    if not schedule:
+        return 0
+    await db.execute(
+        update(models.Video),
+        [{"id": vid_id, "scheduled_date": day} for vid_id, day in schedule],
+    )
+    if playlist_ids:
+        await refresh_playlist_stats(db, playlist_ids)
+    await db.commit()
+    return len(schedule)
+
+
+async def reschedule_playlists(db: AsyncSession, playlist_ids: list[int]):
+    # Replays the saved schedule of many playlists: one settings query, one
+    # (playlist_id, id, duration_seconds) query and one bulk UPDATE
+    playlists = (await db.execute(
+        select(models.Playlist).where(
+            models.Playlist.id.in_(playlist_ids),
+            models.Playlist.schedule_mode != None,
+        )
+    )).scalars().all()
+    if not playlists:
+        return 0
+    rows = await db.execute(
+        select(models.Video.playlist_id, models.Video.id, models.Video.duration_seconds)
+        .where(models.Video.playlist_id.in_([p.id for p in playlists]))
+        .order_by(models.Video.playlist_id, models.Video.position, models.Video.id)
+    )
+    schedule = schedule_playlists(rows, {p.id: p for p in playlists})
+    for playlist in playlists:
+        if playlist.schedule_mode == "capacity":
+            schedule.extend(await capacity_schedule(db, playlist))
+    return await save_schedule(db, schedule, [p.id for p in playlists])
+
+
+async def capacity_timeline(db: AsyncSession, user_id: int, start, fallback_hours: float = None):
+    # The user's availability from `start`; without saved availability every day gets
+    # `fallback_hours`. None when neither is set.
+    weekday_hours, blackout_dates = await user_availability(db, user_id)
+    if weekday_hours is None:
+        if not fallback_hours:
+            return None
+        weekday_hours = [fallback_hours] * 7
+    return CapacityTimeline(start, weekday_hours, blackout_dates)
+
+
+async def capacity_schedule(db: AsyncSession, playlist: models.Playlist):
+    # Replays a "capacity" plan (reschedule-remaining): the unfinished videos are placed
+    # on the owner's current availability from the saved start date
+    timeline = await capacity_timeline(
+        db, playlist.owner_id, playlist.schedule_start_date.date(), playlist.schedule_hours_per_day
+    )
+    if timeline is None or not timeline.has_capacity():
+        return []
+    return schedule_by_capacity(await unfinished_videos(db, playlist.id), timeline)
+
+
+async def user_availability(db: AsyncSession, user_id: int):
+    # Returns (weekday_hours, blackout_dates); weekday_hours is None until the user sets it
+    capacities = (await db.execute(
+        select(models.WeekdayCapacity.weekday, models.WeekdayCapacity.hours)
+        .where(models.WeekdayCapacity.user_id == user_id)
+    )).all()
+    blackouts = (await db.execute(
+        select(models.BlackoutDate.day)
+        .where(models.BlackoutDate.user_id == user_id)
+        .order_by(models.BlackoutDate.day)
+    )).scalars().all()
+
+    weekday_hours = None
+    if capacities:
+        weekday_hours = [0.0] * 7
+        for weekday, hours in capacities:
+            weekday_hours[weekday] = hours or 0.0
+    return weekday_hours, list(blackouts)
+
+
+async def set_user_availability(db: AsyncSession, user_id: int, weekday_hours: list[float], blackout_dates: list):
+    # Replaces the whole availability of the user
+    await db.execute(delete(models.WeekdayCapacity).where(models.WeekdayCapacity.user_id == user_id))
+    await db.execute(delete(models.BlackoutDate).where(models.BlackoutDate.user_id == user_id))
+    await db.execute(insert(models.WeekdayCapacity), [
+        {"user_id": user_id, "weekday": weekday, "hours": hours}
+        for weekday, hours in enumerate(weekday_hours)
+    ])
+    if blackout_dates:
+        await db.execute(insert(models.BlackoutDate), [
+            {"user_id": user_id, "day": day} for day in sorted(set(blackout_dates))
+        ])
+    await db.commit()
+
+
+def _insert_ignoring_duplicates(db: AsyncSession, model):
+    return dialect_insert(db, model).on_conflict_do_nothing()
+
+
+async def add_to_catalog(db: AsyncSession, videos: list[dict]):
+    # Only videos missing from the shared catalog are written; existing ones are left untouched
+    ids = list({video["video_id"] for video in videos})
+    known = set()
+    for i in range(0, len(ids), INSERT_BATCH_SIZE):
+        result = await db.execute(
+            select(models.CatalogVideo.youtube_id)
+            .where(models.CatalogVideo.youtube_id.in_(ids[i:i + INSERT_BATCH_SIZE]))
+        )
+        known.update(result.scalars())
+
+    rows = {}
+    for video in videos:
+        if video["video_id"] not in known:
+            rows[video["video_id"]] = {
+                "youtube_id": video["video_id"],
+                "title": video["title"],
+                "thumbnail": video["thumbnail"],
+                "youtube_url": video["youtube_url"],
+                "duration_seconds": video["duration_seconds"],
+            }
+    rows = list(rows.values())
+    # Ignoring conflicts covers a concurrent import adding the same video
+    stmt = _insert_ignoring_duplicates(db, models.CatalogVideo)
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        await db.execute(stmt, rows[i:i + INSERT_BATCH_SIZE])
+
+
+async def create_imported_playlist(db: AsyncSession, owner_id: int, youtube_url: str, youtube_id: str, data: dict, on_batch=None):
+    # Playlist and all of its videos go in one transaction
+    playlist = models.Playlist(
+        title=data["playlist"]["title"],
+        thumbnail=data["playlist"]["thumbnail"],
+        youtube_url=youtube_url,
+        youtube_id=youtube_id,
+        total_videos=len(data["videos"]),
+        owner_id=owner_id
+    )
+    db.add(playlist)
+    await db.flush()
+
+    await add_to_catalog(db, data["videos"])
+    rows = [
+        {
+            "playlist_id": playlist.id,
+            "catalog_id": video["video_id"],
+            "position": position,
+            "duration_seconds": video["duration_seconds"],
+            "status": "Not Started",
+        }
+        for position, video in enumerate(data["videos"])
+    ]
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[i:i + INSERT_BATCH_SIZE]
+        await db.execute(insert(models.Video), batch)
+        if on_batch:
+            on_batch(len(batch))
+
+    # A new playlist has nothing completed or scheduled yet
+    await db.execute(insert(models.PlaylistStats).values(
+        playlist_id=playlist.id,
+        total_videos=len(rows),
+        completed_videos=0,
+        total_seconds=sum(row["duration_seconds"] or 0 for row in rows),
+        completed_seconds=0,
+        version=1,
+        updated_at=datetime.utcnow(),
+    ))
+    await db.commit()
+    return playlist
+
+
+def percent_complete(completed: int, total: int):
+    return round((completed / total) * 100, 2) if total else 0
+
+
+def date_range(stats: dict):
+    start = stats["scheduled_start"]
+    end = stats["scheduled_end"]
+    return (
+        start.date().isoformat() if start else None,
+        end.date().isoformat() if end else None,
+    )
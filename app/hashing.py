@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+# Kept free of app imports: this module is loaded by every hashing worker process
+
+# bcrypt cost factor; hashes made with another cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASHING_POOL_SIZE = int(os.getenv("HASHING_POOL_SIZE", str(max(1, (os.cpu_count() or 2) // 2))))
+# Workers must not be forked from the server: a fork copies locks held by its other threads
+HASHING_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_pool = None
+
+
+def hash_password(password: str):
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+# Returns (valid, new_hash); new_hash is None unless the stored hash needs upgrading
+def verify_and_update(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# Called by the app lifespan before the event loop's threads and connections exist
+def start_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=HASHING_POOL_SIZE, mp_context=multiprocessing.get_context(HASHING_START_METHOD)
+        )
+    return _pool
+
+
+def get_pool():
+    return _pool or start_pool()
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# Async API: bcrypt runs in a separate process, off the event loop and threadpool
+async def hash_password_async(password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), hash_password, password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), verify_and_update, plain_password, hashed_password)
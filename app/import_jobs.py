@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+import httpx
+from fastapi import Request
+from app import crud
+from app.database import AsyncSessionLocal
+from app.youtube_api import get_playlist_videos
+from app.youtube_cache import youtube_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "4"))
+IMPORT_QUEUE_SIZE = int(os.getenv("IMPORT_QUEUE_SIZE", "100"))
+# Finished jobs are forgotten oldest-first past this many
+IMPORT_JOBS_KEPT = int(os.getenv("IMPORT_JOBS_KEPT", "1000"))
+
+QUEUED = "queued"
+FETCHING = "fetching"
+INSERTING = "inserting"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class ImportJob:
+    def __init__(self, owner_id: int, youtube_url: str, youtube_id: str):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.youtube_url = youtube_url
+        self.youtube_id = youtube_id
+        self.state = QUEUED
+        self.pages_fetched = 0
+        self.videos_fetched = 0
+        self.videos_inserted = 0
+        self.playlist_id = None
+        self.playlist_title = None
+        self.playlist_thumbnail = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+
+    def page_fetched(self, videos_on_page: int):
+        self.pages_fetched += 1
+        self.videos_fetched += videos_on_page
+
+    def batch_inserted(self, rows: int):
+        self.videos_inserted += rows
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "pages_fetched": self.pages_fetched,
+            "videos_fetched": self.videos_fetched,
+            "videos_inserted": self.videos_inserted,
+            "playlist_id": self.playlist_id,
+            "playlist_title": self.playlist_title,
+            "playlist_thumbnail": self.playlist_thumbnail,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ImportJobQueue:
+    """Runs playlist imports on a fixed number of asyncio worker tasks."""
+
+    def __init__(self, client: httpx.AsyncClient, workers: int = IMPORT_WORKERS,
+                 queue_size: int = IMPORT_QUEUE_SIZE, jobs_kept: int = IMPORT_JOBS_KEPT):
+        self.client = client
+        self.workers = workers
+        self.jobs_kept = jobs_kept
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Raises asyncio.QueueFull when the backlog is at capacity
+    def submit(self, owner_id: int, youtube_url: str, youtube_id: str):
+        job = ImportJob(owner_id, youtube_url, youtube_id)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self._forget_old_jobs()
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def _forget_old_jobs(self):
+        while len(self.jobs) > self.jobs_kept:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.state not in (COMPLETED, FAILED):
+                break
+            self.jobs.popitem(last=False)
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            except Exception as exc:
+                logger.exception("Playlist import %s failed", job.id)
+                job.state = FAILED
+                job.error = str(exc) or exc.__class__.__name__
+            finally:
+                job.finished_at = datetime.utcnow()
+                self.queue.task_done()
+
+    async def _run(self, job: ImportJob):
+        job.state = FETCHING
+        await youtube_cache.purge_if_due()
+        data = await get_playlist_videos(job.youtube_id, self.client, on_page=job.page_fetched)
+        if not data or not data["videos"] or not data["playlist"]:
+            job.state = FAILED
+            job.error = "No videos found"
+            return
+
+        job.state = INSERTING
+        async with AsyncSessionLocal() as db:
+            playlist = await crud.create_imported_playlist(
+                db, job.owner_id, job.youtube_url, job.youtube_id, data, on_batch=job.batch_inserted
+            )
+        job.playlist_id = playlist.id
+        job.playlist_title = data["playlist"]["title"]
+        job.playlist_thumbnail = data["playlist"]["thumbnail"]
+        job.state = COMPLETED
+
+
+# Dependency: the app-scoped queue created in the lifespan hook
+def get_import_jobs(request: Request) -> ImportJobQueue:
+    return request.app.state.import_jobs
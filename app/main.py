@@ -1,9 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import playlists, calendar, auth
-from app import models, database
+from app import models, database, youtube_api, hashing
+from app.import_jobs import ImportJobQueue
+from app.write_behind import write_behind
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hashing workers first: their server process is started before any connection or thread
+    hashing.start_pool()
+    # One pooled HTTP client for every YouTube call made by the app
+    app.state.http_client = youtube_api.create_http_client()
+    app.state.import_jobs = ImportJobQueue(app.state.http_client)
+    app.state.import_jobs.start()
+    write_behind.start()
+    try:
+        yield
+    finally:
+        await app.state.import_jobs.stop()
+        # Writes buffered progress updates before the process exits
+        await write_behind.stop()
+        await app.state.http_client.aclose()
+        hashing.shutdown_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS setup — adjust for your frontend domain
 app.add_middleware(
@@ -12,6 +35,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor and cache validators must be readable from the browser
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 # Register all API routes
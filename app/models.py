@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Date, Text, Index, Float
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -11,30 +11,123 @@ class User(Base):
 
     playlists = relationship("Playlist", back_populates="owner")
 
+class WeekdayCapacity(Base):
+    # Study hours a user has on each weekday (0 = Monday)
+    __tablename__ = "weekday_capacity"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    weekday = Column(Integer, primary_key=True)
+    hours = Column(Float, default=0)
+
+class BlackoutDate(Base):
+    # A day with no study time, whatever the weekday capacity says
+    __tablename__ = "blackout_dates"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
 class Playlist(Base):
     __tablename__ = "playlists"
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     youtube_url = Column(String)
     total_videos = Column(Integer)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
     youtube_id = Column(String)
     
     thumbnail = Column(String, nullable=True)
 
+    # Last schedule request, replayed when a sync changes the video list
+    schedule_mode = Column(String, nullable=True)  # "hours", "target", "user" (planned with the user's other playlists) or "capacity" (user availability)
+    schedule_weight = Column(Float, nullable=True)  # share of the user's daily budget in "user" mode
+    schedule_hours_per_day = Column(Float, nullable=True)
+    schedule_start_date = Column(DateTime, nullable=True)
+    schedule_end_date = Column(DateTime, nullable=True)
+
     owner = relationship("User", back_populates="playlists")
     videos = relationship("Video", back_populates="playlist")
 
+class PlaylistStats(Base):
+    # Progress counters kept up to date in the same transaction as every video write;
+    # `python -m app.rebuild_stats` recomputes them from the videos table
+    __tablename__ = "playlist_stats"
+    playlist_id = Column(Integer, ForeignKey("playlists.id"), primary_key=True)
+    total_videos = Column(Integer, default=0)
+    completed_videos = Column(Integer, default=0)
+    total_seconds = Column(Integer, default=0)
+    completed_seconds = Column(Integer, default=0)
+    scheduled_start = Column(DateTime, nullable=True)
+    scheduled_end = Column(DateTime, nullable=True)
+    # Bumped with every write to the playlist's videos; read endpoints derive their ETag from it
+    version = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime, nullable=True)
+
+class WatchActivity(Base):
+    # Videos completed per user, playlist and day; playlist_id 0 sums all of the user's playlists
+    __tablename__ = "watch_activity"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    playlist_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    videos_completed = Column(Integer, default=0)
+    seconds_completed = Column(Integer, default=0)
+
+class WatchStreak(Base):
+    # Streak state updated on every completion; playlist_id 0 is the user-wide streak
+    __tablename__ = "watch_streaks"
+    playlist_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    current_streak = Column(Integer, default=0)  # run of days ending on last_day
+    max_streak = Column(Integer, default=0)
+    last_day = Column(Date, nullable=True)
+
+class CatalogVideo(Base):
+    # Shared across users: one row per YouTube video, however many playlists include it
+    __tablename__ = "video_catalog"
+    youtube_id = Column(String, primary_key=True)
+    title = Column(String)
+    thumbnail = Column(String)
+    youtube_url = Column(String)
+    duration_seconds = Column(Integer)
+
 class Video(Base):
+    # Per-user progress for one catalog video in one playlist
     __tablename__ = "videos"
     id = Column(Integer, primary_key=True)
     playlist_id = Column(Integer, ForeignKey("playlists.id"))
-    title = Column(String)
-    duration_seconds = Column(Integer)
+    catalog_id = Column(String, ForeignKey("video_catalog.youtube_id"))
+    position = Column(Integer)  # index of the item in the YouTube playlist
+    duration_seconds = Column(Integer)  # copied from the catalog for scheduling/stats queries
     scheduled_date = Column(DateTime, nullable=True)
     status = Column(String, default="Not Started")  # Not Started, In Progress, Completed, Rewatch
     notes = Column(Text, nullable=True)
-    youtube_url = Column(String)
-    thumbnail = Column(String)
+    completed_at = Column(DateTime, nullable=True)  # when the status last became Completed
 
     playlist = relationship("Playlist", back_populates="videos")
+    catalog = relationship("CatalogVideo", lazy="joined")
+
+    __table_args__ = (
+        # Progress/stats filters: playlist_id [+ status = 'Completed']
+        Index("ix_videos_playlist_status", "playlist_id", "status"),
+        # Calendar view and date ranges: playlist_id + ORDER BY scheduled_date
+        Index("ix_videos_playlist_scheduled", "playlist_id", "scheduled_date"),
+        # Playlist order for scheduling and sync
+        Index("ix_videos_playlist_position", "playlist_id", "position"),
+    )
+
+    @property
+    def title(self):
+        return self.catalog.title if self.catalog else None
+
+    @property
+    def thumbnail(self):
+        return self.catalog.thumbnail if self.catalog else None
+
+    @property
+    def youtube_url(self):
+        return self.catalog.youtube_url if self.catalog else None
+
+class YouTubeCacheEntry(Base):
+    __tablename__ = "youtube_cache"
+    key = Column(String, primary_key=True)  # e.g. "playlistItems:<playlist id>:<page token>"
+    etag = Column(String, nullable=True)
+    body = Column(Text)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
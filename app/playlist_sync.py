@@ -0,0 +1,200 @@
+from collections import Counter, defaultdict, deque
+from types import SimpleNamespace
+import httpx
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, crud
+from app.calendar_logic import schedule_by_hours_per_day, schedule_by_target_date
+from app.youtube_api import FetchMeter, get_playlist_items, get_video_durations
+from app.write_behind import write_behind
+
+
+def diff_playlist(existing, remote):
+    """Match stored videos to the current YouTube item list.
+
+    `existing` rows need id, catalog_id and position; `remote` is the ordered
+    list of YouTube video ids. Returns (inserts, deletes, moves) where inserts
+    are (position, video_id), deletes are row ids and moves are (row id,
+    new position). Duplicated videos are matched in playlist order.
+    """
+    rows_by_video = defaultdict(deque)
+    for row in sorted(existing, key=lambda r: (r.position if r.position is not None else -1, r.id)):
+        rows_by_video[row.catalog_id].append(row)
+
+    inserts = []
+    moves = []
+    for position, video_id in enumerate(remote):
+        candidates = rows_by_video.get(video_id)
+        if candidates:
+            row = candidates.popleft()
+            if row.position != position:
+                moves.append((row.id, position))
+        else:
+            inserts.append((position, video_id))
+
+    deletes = [row.id for rows in rows_by_video.values() for row in rows]
+    return inserts, deletes, moves
+
+
+# Catalog ids the user-008 migration gave rows it could not parse a YouTube id for
+LEGACY_PREFIX = "legacy-"
+
+
+def _is_legacy(catalog_id):
+    return catalog_id is None or catalog_id.startswith(LEGACY_PREFIX)
+
+
+def _title_key(title):
+    return (title or "").strip().casefold()
+
+
+def match_legacy_rows(existing, remote_items):
+    """Pair legacy rows with the remote videos they most likely are.
+
+    `existing` rows need id, catalog_id, position and title; `remote_items`
+    are the ordered playlist items. Remote entries already accounted for by
+    a stored YouTube id are skipped; the rest are matched to legacy rows by
+    title, in playlist order. Returns (relinks, unmatched): relinks are
+    (row id, video_id) and unmatched are ids of legacy rows left as they are.
+    """
+    stored = Counter(row.catalog_id for row in existing if not _is_legacy(row.catalog_id))
+    candidates = defaultdict(deque)
+    for item in remote_items:
+        if stored[item["video_id"]]:
+            stored[item["video_id"]] -= 1
+        else:
+            candidates[_title_key(item["title"])].append(item["video_id"])
+
+    relinks = []
+    unmatched = []
+    legacy = [row for row in existing if _is_legacy(row.catalog_id)]
+    for row in sorted(legacy, key=lambda r: (r.position if r.position is not None else -1, r.id)):
+        queue = candidates.get(_title_key(row.title))
+        if queue:
+            relinks.append((row.id, queue.popleft()))
+        else:
+            unmatched.append(row.id)
+    return relinks, unmatched
+
+
+# Plans _replay_schedule can rebuild for one playlist on its own
+REPLAYED_MODES = ("hours", "target", "capacity")
+
+
+async def _replay_schedule(db: AsyncSession, playlist: models.Playlist):
+    # (videos with their current date, replayed (video_id, date) pairs) for the saved plan
+    if playlist.schedule_mode == "capacity":
+        videos = await crud.unfinished_videos(db, playlist.id)
+        return videos, await crud.capacity_schedule(db, playlist)
+    videos = (await db.execute(
+        select(models.Video.id, models.Video.duration_seconds, models.Video.scheduled_date)
+        .where(models.Video.playlist_id == playlist.id)
+        .order_by(models.Video.position, models.Video.id)
+    )).all()
+    if playlist.schedule_mode == "hours":
+        return videos, schedule_by_hours_per_day(videos, playlist.schedule_hours_per_day, playlist.schedule_start_date)
+    if playlist.schedule_mode == "target":
+        return videos, schedule_by_target_date(videos, playlist.schedule_end_date, playlist.schedule_start_date)
+    return videos, []
+
+
+async def sync_playlist(db: AsyncSession, playlist: models.Playlist, youtube_id: str, client: httpx.AsyncClient):
+    meter = FetchMeter()
+    # Raises YouTubeAPIError unless every page of the chain was fetched: a partial
+    # list would otherwise read as deleted videos
+    items = await get_playlist_items(youtube_id, client, meter)
+    remote = [item["video_id"] for item in items]
+    new_items = {item["video_id"]: item for item in items}
+
+    existing = (await db.execute(
+        select(
+            models.Video.id, models.Video.catalog_id, models.Video.position,
+            models.Video.duration_seconds, models.CatalogVideo.title,
+        )
+        .outerjoin(models.CatalogVideo, models.CatalogVideo.youtube_id == models.Video.catalog_id)
+        .where(models.Video.playlist_id == playlist.id)
+    )).all()
+
+    # Legacy rows keep their status and notes: they are pointed at the matching YouTube
+    # video, or left out of the diff (never deleted) when no title matches
+    relinks, legacy_unmatched = match_legacy_rows(existing, items)
+    rows_written = 0
+    if relinks:
+        rows = {row.id: row for row in existing}
+        await crud.add_to_catalog(db, [
+            {**new_items[video_id], "duration_seconds": rows[row_id].duration_seconds}
+            for row_id, video_id in relinks
+        ])
+        await db.execute(update(models.Video), [{"id": row_id, "catalog_id": video_id} for row_id, video_id in relinks])
+        rows_written += len(relinks)
+        relinked = dict(relinks)
+        existing = [
+            SimpleNamespace(**{**row._asdict(), "catalog_id": relinked.get(row.id, row.catalog_id)})
+            for row in existing
+        ]
+    skipped = set(legacy_unmatched)
+    inserts, deletes, moves = diff_playlist([row for row in existing if row.id not in skipped], remote)
+
+    # Durations are only needed for videos this playlist does not have yet
+    new_ids = list({video_id for _, video_id in inserts})
+    durations = await get_video_durations(new_ids, client, meter) if new_ids else {}
+    # Videos YouTube no longer returns (private/deleted) are not added
+    inserts = [(position, video_id) for position, video_id in inserts if video_id in durations]
+
+    if deletes:
+        await db.execute(delete(models.Video).where(models.Video.id.in_(deletes)))
+        rows_written += len(deletes)
+    if moves:
+        await db.execute(update(models.Video), [{"id": vid, "position": pos} for vid, pos in moves])
+        rows_written += len(moves)
+    if inserts:
+        await crud.add_to_catalog(db, [
+            {**new_items[video_id], "duration_seconds": durations[video_id]}
+            for video_id in {video_id for _, video_id in inserts}
+        ])
+        await db.execute(insert(models.Video), [
+            {
+                "playlist_id": playlist.id,
+                "catalog_id": video_id,
+                "position": position,
+                "duration_seconds": durations[video_id],
+                "status": "Not Started",
+            }
+            for position, video_id in inserts
+        ])
+        rows_written += len(inserts)
+
+    rescheduled = 0
+    if (inserts or deletes or moves) and playlist.schedule_mode:
+        videos, replayed = await _replay_schedule(db, playlist)
+        current = {v.id: v.scheduled_date for v in videos}
+        # Only rows whose date actually changes are written
+        changed = [(vid, day) for vid, day in replayed if current[vid] != day]
+        if changed:
+            await db.execute(update(models.Video), [{"id": vid, "scheduled_date": day} for vid, day in changed])
+        rescheduled = len(changed)
+        rows_written += rescheduled
+    # A "user" plan spans the user's other playlists, so new videos keep a NULL date
+    # until POST /calendar/user/me/schedule is run again
+    unscheduled = len(inserts) if playlist.schedule_mode not in REPLAYED_MODES else 0
+
+    if inserts or deletes:
+        playlist.total_videos = len(existing) - len(deletes) + len(inserts)
+    if rows_written:
+        await crud.refresh_playlist_stats(db, [playlist.id])
+    await db.commit()
+    if deletes:
+        write_behind.forget(deletes)
+
+    return {
+        "inserted": len(inserts),
+        "deleted": len(deletes),
+        "moved": len(moves),
+        "rescheduled": rescheduled,
+        "unscheduled": unscheduled,
+        "relinked": len(relinks),
+        "legacy_unmatched": len(legacy_unmatched),
+        "rows_written": rows_written,
+        "requests": meter.requests,
+        "bytes_fetched": meter.bytes,
+    }
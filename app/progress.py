@@ -0,0 +1,100 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud, models, streaks
+
+
+async def _set_statuses(db: AsyncSession, targets: dict, seen: dict, now: datetime):
+    # Conditional status writes: a row is only changed while it still has the status read
+    # before (`seen`). Returns (video_id, old_status, new_status) for the rows that changed.
+    changes = []
+    while targets:
+        groups = defaultdict(list)
+        for video_id, status in targets.items():
+            groups[(seen[video_id], status)].append(video_id)
+        for (old, new), video_ids in groups.items():
+            changed = (await db.execute(
+                update(models.Video)
+                .where(
+                    models.Video.id.in_(video_ids),
+                    models.Video.status.is_(None) if old is None else models.Video.status == old,
+                )
+                .values(status=new, completed_at=now if new == crud.COMPLETED else None)
+                .returning(models.Video.id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            for video_id in changed:
+                changes.append((video_id, old, new))
+                del targets[video_id]
+        if targets:
+            # A concurrent update got in first. This transaction now holds the write lock
+            # (SQLite) or the row locks (PostgreSQL), so the status read again is final.
+            seen = dict((await db.execute(
+                select(models.Video.id, models.Video.status).where(models.Video.id.in_(list(targets)))
+            )).all())
+            targets = {
+                video_id: status for video_id, status in targets.items()
+                if video_id in seen and seen[video_id] != status
+            }
+    return changes
+
+
+async def apply_video_updates(db: AsyncSession, user_id: int, items, now: datetime = None):
+    """Apply status/notes changes to videos owned by `user_id`.
+
+    `items` have id, status and notes (None leaves a field unchanged) and
+    are applied in order. Costs one ownership SELECT, one bulk UPDATE of
+    notes and one conditional UPDATE per (old, new) status pair; a status
+    is only written while the row still has the status read here, so
+    concurrent updates of a video never count the same change twice.
+    playlist_stats (counters and version) and streaks move in the same
+    transaction, for the rows that actually changed. The caller commits.
+    Returns one result dict per item.
+    """
+    rows = {
+        row.id: row for row in (await db.execute(
+            select(
+                models.Video.id, models.Video.playlist_id, models.Video.duration_seconds,
+                models.Video.status, models.Video.notes,
+            )
+            .join(models.Playlist)
+            .where(models.Video.id.in_({item.id for item in items}), models.Playlist.owner_id == user_id)
+            # Serializes writers on PostgreSQL; SQLite ignores it and relies on the conditional writes
+            .with_for_update(of=models.Video)
+        ))
+    }
+    state = {vid: {"status": row.status, "notes": row.notes} for vid, row in rows.items()}
+    now = now or datetime.utcnow()
+    results = []
+
+    for item in items:
+        video = state.get(item.id)
+        if video is None:
+            results.append({"id": item.id, "updated": False, "error": "Video not found"})
+            continue
+        if item.status is not None:
+            video["status"] = item.status
+        if item.notes is not None:
+            video["notes"] = item.notes
+        results.append({"id": item.id, "updated": True, "status": video["status"], "notes": video["notes"]})
+
+    if not state:
+        return results
+    notes = [{"id": vid, "notes": video["notes"]} for vid, video in state.items() if video["notes"] != rows[vid].notes]
+    if notes:
+        await db.execute(update(models.Video), notes)
+    changes = await _set_statuses(
+        db,
+        {vid: video["status"] for vid, video in state.items() if video["status"] != rows[vid].status},
+        {vid: row.status for vid, row in rows.items()},
+        now,
+    )
+    await crud.apply_status_changes(db, [
+        (rows[vid].playlist_id, rows[vid].duration_seconds, old, new) for vid, old, new in changes
+    ])
+    await crud.bump_playlist_versions(db, {row.playlist_id for row in rows.values()})
+    await streaks.record_completions(db, user_id, [
+        (rows[vid].playlist_id, rows[vid].duration_seconds) for vid, old, new in changes if new == crud.COMPLETED
+    ], now)
+    return results
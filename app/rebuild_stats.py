@@ -0,0 +1,41 @@
+# rebuild_stats.py
+# Recomputes playlist_stats from the videos table.
+#   python -m app.rebuild_stats          rebuild the playlists whose stats drifted
+#   python -m app.rebuild_stats --check  only report playlists whose stats drifted
+import asyncio
+import sys
+from sqlalchemy import select
+from app import crud, models
+from app.database import AsyncSessionLocal
+
+
+async def rebuild(check_only: bool = False):
+    async with AsyncSessionLocal() as db:
+        playlist_ids = (await db.execute(select(models.Playlist.id))).scalars().all()
+        drifted = []
+        for i in range(0, len(playlist_ids), crud.INSERT_BATCH_SIZE):
+            batch = playlist_ids[i:i + crud.INSERT_BATCH_SIZE]
+            expected = await crud.compute_playlist_stats(db, batch)
+            stored = {
+                row.playlist_id: {field: getattr(row, field) for field in crud.STATS_FIELDS}
+                for row in (await db.execute(
+                    select(models.PlaylistStats).where(models.PlaylistStats.playlist_id.in_(batch))
+                )).scalars()
+            }
+            batch_drifted = [pid for pid in batch if stored.get(pid) != expected[pid]]
+            drifted.extend(batch_drifted)
+            if not check_only:
+                # Up-to-date rows keep their version, so cached responses stay valid
+                await crud.refresh_playlist_stats(db, batch_drifted)
+        if not check_only:
+            await db.commit()
+    return len(playlist_ids), drifted
+
+
+if __name__ == "__main__":
+    check_only = "--check" in sys.argv[1:]
+    total, drifted = asyncio.run(rebuild(check_only))
+    print(f"{total} playlists checked, {len(drifted)} out of date" + ("" if check_only else ", all rebuilt"))
+    if drifted:
+        print("Out of date:", ", ".join(map(str, drifted)))
+    sys.exit(1 if check_only and drifted else 0)
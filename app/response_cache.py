@@ -0,0 +1,80 @@
+import hashlib
+import os
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+# Serialized bodies kept in memory; 0 turns the cache off (ETags and 304s still work)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+CachedBody = namedtuple("CachedBody", "body headers")
+
+
+class ResponseCache:
+    """LRU of serialized JSON responses for the calendar read endpoints.
+
+    Keys are (endpoint, playlist, version, params). Every write to a
+    playlist's videos bumps its version in playlist_stats, so an entry is
+    never served after a write; stale entries simply age out.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry: CachedBody):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def etag(key):
+    # Strong validator: one key is one version of one representation
+    return '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: str, tag: str):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return tag in {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+
+
+def http_date(value: datetime):
+    # updated_at columns hold naive UTC
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+response_cache = ResponseCache()
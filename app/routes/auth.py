@@ -1,37 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
-from app import models, database, auth, schemas
+from app import models, database, auth, schemas, hashing
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
 @router.post("/register", response_model=schemas.UserOut)
-def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    existing_user = (await db.execute(select(models.User).where(models.User.email == user.email))).scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = auth.hash_password(user.password)
+    hashed_pw = await hashing.hash_password_async(user.password)
     new_user = models.User(email=user.email, hashed_password=hashed_pw)
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     return new_user
 
 
 @router.post("/login", response_model=schemas.Token)
-def login_user(
+async def login_user(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    db_user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    db_user = (await db.execute(select(models.User).where(models.User.email == form_data.username))).scalar_one_or_none()
 
-    if not db_user or not auth.verify_password(form_data.password, db_user.hashed_password):
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = auth.create_access_token(data={"sub": str(db_user.id)})
+    valid, new_hash = await hashing.verify_and_update_async(form_data.password, db_user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Cost factor changed since this hash was made: store the upgraded one
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+        # The users row changed: drop identities cached from it
+        auth.invalidate_user(db_user.id)
+
+    token = auth.create_access_token(data={"sub": str(db_user.id), "email": db_user.email})
 
     return {"access_token": token, "token_type": "bearer"}
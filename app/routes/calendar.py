@@ -1,17 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import database, models
 from datetime import datetime
-from app.calendar_logic import schedule_by_hours_per_day, schedule_by_target_date
-from pydantic import BaseModel
+from app.calendar_logic import (
+    schedule_by_hours_per_day, schedule_by_target_date, schedule_by_capacity, schedule_user_playlists,
+    CapacityTimeline, PlaylistLane,
+)
+from pydantic import BaseModel, Field
 from typing import Optional
-from datetime import date, timedelta
+from datetime import date
 from collections import defaultdict
 from app.auth import get_current_user
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas import PlaylistCreateSchema
-from typing import Literal
+from typing import Literal, Annotated
 from app import models
+from app import crud, streaks
+from app.progress import apply_video_updates
+from app.write_behind import write_behind
+from app.response_cache import CachedBody, response_cache, etag, etag_matches, http_date
 
 router = APIRouter(prefix="/calendar", tags=["Calendar"])
 
@@ -23,41 +34,57 @@ class ScheduleByHoursRequest(BaseModel):
     playlist_id: int
     hours_per_day: float
     start_date: str
+class AvailabilitySchema(BaseModel):
+    weekday_hours: list[Annotated[float, Field(ge=0, le=24)]] = Field(min_length=7, max_length=7)  # Monday first
+    blackout_dates: list[date] = []
+class PlaylistPlan(BaseModel):
+    playlist_id: int
+    weight: Optional[float] = Field(None, gt=0)
+    target_date: Optional[date] = None
+class UserScheduleRequest(BaseModel):
+    start_date: Optional[date] = None
+    hours_per_day: Optional[float] = Field(None, gt=0, le=24)  # overrides the weekday availability
+    playlists: Optional[list[PlaylistPlan]] = Field(None, min_length=1)  # defaults to every playlist of the user
 class VideoUpdateSchema(BaseModel):
     status: Literal['Not Started', 'In Progress', 'Completed']
-    notes: Optional[str] = ""
+    notes: Optional[str] = None  # None leaves the notes as they are
+class VideoBatchItem(BaseModel):
+    id: int
+    status: Optional[Literal['Not Started', 'In Progress', 'Completed']] = None
+    notes: Optional[str] = None
 
 @router.post("/schedule/by-hours")
-def schedule_by_hours(
+async def schedule_by_hours(
     payload: ScheduleByHoursRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    playlist = db.query(models.Playlist).filter(models.Playlist.id == payload.playlist_id).first()
+    playlist = await db.get(models.Playlist, payload.playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
 
-    videos = db.query(models.Video).filter(models.Video.playlist_id == payload.playlist_id).all()
+    videos = await crud.schedulable_videos(db, payload.playlist_id)
     if not videos:
         raise HTTPException(status_code=404, detail="No videos to schedule")
 
     start = datetime.strptime(payload.start_date, "%Y-%m-%d")
     schedule = schedule_by_hours_per_day(videos, payload.hours_per_day, start)
 
-    for vid_id, date in schedule:
-        db.query(models.Video).filter(models.Video.id == vid_id).update({
-            "scheduled_date": date
-        })
-    db.commit()
+    playlist.schedule_mode = "hours"
+    playlist.schedule_hours_per_day = payload.hours_per_day
+    playlist.schedule_start_date = start
+    playlist.schedule_end_date = None
+
+    await crud.save_schedule(db, schedule, [playlist.id])
 
     return {"message": "Videos scheduled successfully (by hours/day)."}
 
 @router.post("/schedule/by-date")
-def schedule_by_target(playlist_id: int, target_date: str, start_date: str, db: Session = Depends(database.get_db)):
-    playlist = db.query(models.Playlist).filter(models.Playlist.id == playlist_id).first()
+async def schedule_by_target(playlist_id: int, target_date: str, start_date: str, db: AsyncSession = Depends(database.get_async_db)):
+    playlist = await db.get(models.Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
 
-    videos = db.query(models.Video).filter(models.Video.playlist_id == playlist_id).all()
+    videos = await crud.schedulable_videos(db, playlist_id)
     if not videos:
         raise HTTPException(status_code=404, detail="No videos to schedule")
 
@@ -65,17 +92,18 @@ def schedule_by_target(playlist_id: int, target_date: str, start_date: str, db:
     end = datetime.strptime(target_date, "%Y-%m-%d")
     schedule = schedule_by_target_date(videos, end, start)
 
-    for vid_id, date in schedule:
-        db.query(models.Video).filter(models.Video.id == vid_id).update({
-            "scheduled_date": date
-        })
-    db.commit()
+    playlist.schedule_mode = "target"
+    playlist.schedule_hours_per_day = None
+    playlist.schedule_start_date = start
+    playlist.schedule_end_date = end
+
+    await crud.save_schedule(db, schedule, [playlist.id])
 
     return {"message": "Videos scheduled successfully (by target date)."}
 
 
 # @router.put("/video/{video_id}")
-# def update_video_progress(video_id: int, update: VideoStatusUpdate, db: Session = Depends(database.get_db)):
+# def update_video_progress(video_id: int, update: VideoStatusUpdate, db: AsyncSession = Depends(database.get_async_db)):
 #     video = db.query(models.Video).filter(models.Video.id == video_id).first()
 #     if not video:
 #         raise HTTPException(status_code=404, detail="Video not found")
@@ -102,78 +130,160 @@ def schedule_by_target(playlist_id: int, target_date: str, start_date: str, db:
 #     }
 
 
+def _video_item(row, include_notes: bool):
+    item = {
+        "id": row.id,
+        "title": row.title,
+        "scheduled_date": row.scheduled_date,
+        "status": row.status,
+        "thumbnail": row.thumbnail,
+        "youtube_url": row.youtube_url
+    }
+    if include_notes:
+        item["notes"] = row.notes
+    return write_behind.overlay(item)
+
+def _calendar_item(row, include_notes: bool):
+    item = {
+        "id": row.id,
+        "title": row.title,
+        "status": row.status,
+        "duration_seconds": row.duration_seconds,
+        "youtube_url": row.youtube_url
+    }
+    if include_notes:
+        item["notes"] = row.notes
+    return write_behind.overlay(item)
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _ndjson_response(stmt, to_item):
+    # Rows are streamed from a server-side cursor, STREAM_BATCH_SIZE at a time.
+    # The generator owns its session: the request's session is closed before the body is sent.
+    async def rows():
+        async with database.AsyncSessionLocal() as db:
+            result = await db.stream(stmt.execution_options(yield_per=crud.STREAM_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield "".join(json.dumps(to_item(row), default=_json_default) + "\n" for row in rows)
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+def _calendar_cursor(cursor: Optional[str]):
+    # "<scheduled_date ISO>,<id>" as returned in X-Next-Cursor
+    if cursor is None:
+        return None
+    try:
+        scheduled, video_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(scheduled), int(video_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _versioned_response(request: Request, key, updated_at, build, still_current=None):
+    # `key` holds the playlist version(s) and every parameter that shapes the body. A match
+    # with If-None-Match is answered with 304 before build() runs; otherwise the serialized
+    # body comes from the LRU or from build(), which returns (content, extra headers).
+    headers = {"ETag": etag(key), "Cache-Control": "no-cache"}
+    if updated_at:
+        headers["Last-Modified"] = http_date(updated_at)
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    cached = response_cache.get(key)
+    if cached is None:
+        content, extra_headers = await build()
+        if still_current and not still_current():
+            # The body no longer matches the version in the key: serve it without a validator
+            return JSONResponse(jsonable_encoder(content), headers=extra_headers)
+        cached = CachedBody(JSONResponse(jsonable_encoder(content)).body, extra_headers)
+        response_cache.put(key, cached)
+    return Response(cached.body, media_type="application/json", headers={**cached.headers, **headers})
+
+async def _playlist_response(request: Request, db: AsyncSession, endpoint: str, playlist_id: int, params, build):
+    # The version is read before the videos, so a body is never older than the version it is
+    # stored under. Playlists with buffered writes are served uncached: their rows carry the
+    # pending values (overlay) but the version does not count them yet.
+    version = await crud.playlist_version(db, playlist_id)
+    if version is None or write_behind.has_pending(playlist_id):
+        content, headers = await build()
+        return JSONResponse(jsonable_encoder(content), headers=headers)
+    key = (endpoint, playlist_id, version.version, version.updated_at, params)
+    return await _versioned_response(
+        request, key, version.updated_at, build, still_current=lambda: not write_behind.has_pending(playlist_id)
+    )
+
 @router.get("/playlist/{playlist_id}/videos")
-def get_playlist_videos(playlist_id: int, db: Session = Depends(database.get_db)):
-    videos = db.query(models.Video).filter(models.Video.playlist_id == playlist_id).all()
-    return [
-        {
-            "id": v.id,
-            "title": v.title,
-            "scheduled_date": v.scheduled_date,
-            "status": v.status,
-            "notes": v.notes,
-            "thumbnail": v.thumbnail,
-            "youtube_url": v.youtube_url
-
-        } for v in videos
-    ]
+async def get_playlist_videos(
+    playlist_id: int,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = None,  # last id of the previous page
+    include_notes: bool = True,
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    stmt = crud.playlist_videos_query(playlist_id, include_notes, after_id=cursor, limit=limit)
+    if format == "ndjson":
+        return _ndjson_response(stmt, lambda row: _video_item(row, include_notes))
+
+    async def build():
+        rows = (await db.execute(stmt)).all()
+        headers = {}
+        if limit is not None and len(rows) == limit:
+            headers["X-Next-Cursor"] = str(rows[-1].id)
+        return [_video_item(row, include_notes) for row in rows], headers
+
+    return await _playlist_response(request, db, "videos", playlist_id, (limit, cursor, include_notes), build)
 
 @router.get("/playlist/{playlist_id}/progress")
-def get_progress_summary(playlist_id: int, db: Session = Depends(database.get_db)):
-    videos = db.query(models.Video).filter(models.Video.playlist_id == playlist_id).all()
-    total = len(videos)
-    completed = sum(1 for v in videos if v.status == "Completed")
+async def get_progress_summary(playlist_id: int, request: Request, db: AsyncSession = Depends(database.get_async_db)):
+    await write_behind.flush([playlist_id])
 
-    if total == 0:
-        return {"total": 0, "completed": 0, "percentage": 0}
+    async def build():
+        stats = await crud.playlist_stats(db, playlist_id)
+        total = stats["total_videos"]
+        completed = stats["completed_videos"]
 
-    percent = round((completed / total) * 100, 2)
-    return {
-        "playlist_id": playlist_id,
-        "total_videos": total,
-        "completed": completed,
-        "percentage": percent
-    }
+        if total == 0:
+            return {"total": 0, "completed": 0, "percentage": 0}, {}
+
+        percent = crud.percent_complete(completed, total)
+        return {
+            "playlist_id": playlist_id,
+            "total_videos": total,
+            "completed": completed,
+            "percentage": percent
+        }, {}
+
+    return await _playlist_response(request, db, "progress", playlist_id, (), build)
 
 @router.get("/playlist/{playlist_id}/streak")
-def get_watch_streak(playlist_id: int, db: Session = Depends(database.get_db)):
-    videos = db.query(models.Video).filter(
-        models.Video.playlist_id == playlist_id,
-        models.Video.status == "Completed",
-        models.Video.scheduled_date != None
-    ).all()
-
-    watched_dates = {v.scheduled_date.date() for v in videos}
-    if not watched_dates:
-        return {"current_streak": 0, "max_streak": 0}
-
-    sorted_dates = sorted(watched_dates)
-    max_streak = 1
-    current_streak = 1
-    today = date.today()
-
-    for i in range(1, len(sorted_dates)):
-        if sorted_dates[i] == sorted_dates[i - 1] + timedelta(days=1):
-            current_streak += 1
-            max_streak = max(max_streak, current_streak)
-        else:
-            current_streak = 1
-
-    # Check if last watched day was yesterday or today to count current streak
-    last_day = sorted_dates[-1]
-    if last_day == today or last_day == today - timedelta(days=1):
-        current = current_streak
-    else:
-        current = 0
-
-    return {"current_streak": current, "max_streak": max_streak}
+async def get_watch_streak(playlist_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    # Streak state is kept up to date on every completion; this is a primary-key read
+    await write_behind.flush([playlist_id])
+    owner_id = (await db.execute(
+        select(models.Playlist.owner_id).where(models.Playlist.id == playlist_id)
+    )).scalar()
+    if owner_id is None:
+        return {"current_streak": 0, "max_streak": 0, "last_active": None}
+    return await streaks.get_streak(db, owner_id, playlist_id)
+
+
+@router.get("/user/me/streak")
+async def get_user_streak(db: AsyncSession = Depends(database.get_async_db), current_user = Depends(get_current_user)):
+    # Days with at least one completed video in any playlist
+    await write_behind.flush_user(current_user.id)
+    return await streaks.get_streak(db, current_user.id)
 
 
 @router.get("/playlist/{playlist_id}/watch-time")
-def get_watch_time(playlist_id: int, db: Session = Depends(database.get_db)):
-    videos = db.query(models.Video).filter(models.Video.playlist_id == playlist_id).all()
-    total = sum(v.duration_seconds for v in videos)
-    completed = sum(v.duration_seconds for v in videos if v.status == "Completed")
+async def get_watch_time(playlist_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    await write_behind.flush([playlist_id])
+    stats = await crud.playlist_stats(db, playlist_id)
+    total = stats["total_seconds"]
+    completed = stats["completed_seconds"]
 
     return {
         "total_time_sec": total,
@@ -182,102 +292,152 @@ def get_watch_time(playlist_id: int, db: Session = Depends(database.get_db)):
     }
 
 @router.get("/playlist/{playlist_id}/chart-data")
-def get_chart_summary(playlist_id: int, db: Session = Depends(database.get_db)):
-    videos = db.query(models.Video).filter(models.Video.playlist_id == playlist_id).all()
-    total = len(videos)
-    completed = sum(1 for v in videos if v.status == "Completed")
+async def get_chart_summary(playlist_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    await write_behind.flush([playlist_id])
+    stats = await crud.playlist_stats(db, playlist_id)
     return {
-        "total_videos": total,
-        "completed_videos": completed
+        "total_videos": stats["total_videos"],
+        "completed_videos": stats["completed_videos"]
     }
 
 
 @router.get("/playlist/{playlist_id}/calendar-view")
-def get_calendar_view(playlist_id: int, db: Session = Depends(database.get_db)):
-    videos = db.query(models.Video).filter(
-        models.Video.playlist_id == playlist_id,
-        models.Video.scheduled_date != None
-    ).order_by(models.Video.scheduled_date).all()
-
-    if not videos:
-        raise HTTPException(status_code=404, detail="No scheduled videos found")
-
-    calendar = defaultdict(list)
-
-    for v in videos:
-        date_key = v.scheduled_date.date().isoformat()
-        calendar[date_key].append({
-            "id": v.id,
-            "title": v.title,
-            "status": v.status,
-            "duration_seconds": v.duration_seconds,
-            "notes": v.notes,
-            "youtube_url": v.youtube_url
-
-        })
-
-    # Convert to a sorted list
-    calendar_list = [{"date": date, "videos": vids} for date, vids in sorted(calendar.items())]
-    return calendar_list
+async def get_calendar_view(
+    playlist_id: int,
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),  # videos per page; a day can span two pages
+    cursor: Optional[str] = None,
+    include_notes: bool = True,
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    end = datetime.combine(end_date, datetime.max.time()) if end_date else None
+    stmt = crud.calendar_videos_query(
+        playlist_id, include_notes, start=start, end=end, after=_calendar_cursor(cursor), limit=limit
+    )
+    if format == "ndjson":
+        # One video per line, with its date, in calendar order
+        return _ndjson_response(
+            stmt, lambda row: {"date": row.scheduled_date.date(), **_calendar_item(row, include_notes)}
+        )
+
+    async def build():
+        videos = (await db.execute(stmt)).all()
+
+        if not videos and cursor is None:
+            raise HTTPException(status_code=404, detail="No scheduled videos found")
+        headers = {}
+        if limit is not None and len(videos) == limit:
+            last = videos[-1]
+            headers["X-Next-Cursor"] = f"{last.scheduled_date.isoformat()},{last.id}"
+
+        calendar = defaultdict(list)
+
+        for v in videos:
+            date_key = v.scheduled_date.date().isoformat()
+            calendar[date_key].append(_calendar_item(v, include_notes))
+
+        # Convert to a sorted list
+        calendar_list = [{"date": date, "videos": vids} for date, vids in sorted(calendar.items())]
+        return calendar_list, headers
+
+    params = (start_date, end_date, limit, cursor, include_notes)
+    return await _playlist_response(request, db, "calendar-view", playlist_id, params, build)
 
 from fastapi import Body
 
 @router.put("/video/{video_id}")
-def update_video(
+async def update_video(
     video_id: int,
     payload: VideoUpdateSchema = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user),
 ):
+    if write_behind.enabled:
+        # Buffered: written with other pending changes on the next flush
+        playlist_id = await write_behind.playlist_of(db, user.id, video_id)
+        if playlist_id is None:
+            raise HTTPException(status_code=404, detail="Video not found")
+        await write_behind.enqueue(user.id, playlist_id, video_id, payload.status, payload.notes)
+        return {"message": "Video updated successfully"}
+
     # 🛠 Update the video in DB
-    video = db.query(models.Video).join(models.Playlist).filter(models.Video.id == video_id, models.Playlist.owner_id == user.id).first()
-    if not video:
+    result = (await apply_video_updates(
+        db, user.id, [VideoBatchItem(id=video_id, status=payload.status, notes=payload.notes)]
+    ))[0]
+    if not result["updated"]:
         raise HTTPException(status_code=404, detail="Video not found")
-
-    video.status = payload.status
-    db.commit()
-    db.refresh(video)
+    await db.commit()
 
     return {"message": "Video updated successfully"}
 
+@router.patch("/videos")
+async def update_videos(
+    items: Annotated[list[VideoBatchItem], Body(min_length=1, max_length=1000)],
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+):
+    # Buffered changes go first so they cannot overwrite this batch later
+    await write_behind.flush_user(user.id)
+    results = await apply_video_updates(db, user.id, items)
+    await db.commit()
+    return {
+        "updated": sum(result["updated"] for result in results),
+        "results": results,
+    }
+
 @router.get("/user/me/dashboard")
-def user_dashboard(db: Session = Depends(database.get_db), current_user = Depends(get_current_user)):
-    playlists = db.query(models.Playlist).filter(models.Playlist.owner_id == current_user.id).all()
-    
+async def user_dashboard(request: Request, db: AsyncSession = Depends(database.get_async_db), current_user = Depends(get_current_user)):
+    await write_behind.flush_user(current_user.id)
+    # One entry per playlist: a new playlist or a write to any of them changes the key
+    versions = await crud.user_playlist_versions(db, current_user.id)
+    if any(v.version is None for v in versions):
+        return (await _dashboard(db, current_user.id))[0]
+    key = ("dashboard", current_user.id, tuple((v.id, v.version, v.updated_at) for v in versions))
+    updated_at = max((v.updated_at for v in versions if v.updated_at), default=None)
+    return await _versioned_response(request, key, updated_at, lambda: _dashboard(db, current_user.id))
+
+async def _dashboard(db: AsyncSession, user_id: int):
     result = []
 
-    for pl in playlists:
-        videos = db.query(models.Video).filter(models.Video.playlist_id == pl.id).all()
-        total = len(videos)
-        completed = sum(1 for v in videos if v.status == "Completed")
-
-        current_user = Depends(get_current_user)
+    for pl in await crud.user_playlist_stats(db, user_id):
+        total = pl["total_videos"]
+        completed = pl["completed_videos"]
 
         # Calendar range
-        dates = [v.scheduled_date for v in videos if v.scheduled_date]
-        start = min(dates).date().isoformat() if dates else None
-        end = max(dates).date().isoformat() if dates else None
-
-        percent = round((completed / total) * 100, 2) if total else 0
+        start, end = crud.date_range(pl)
 
         result.append({
-            "playlist_id": pl.id,
-            "title": pl.title,
-            "youtube_url": pl.youtube_url,
+            "playlist_id": pl["id"],
+            "title": pl["title"],
+            "youtube_url": pl["youtube_url"],
             "total_videos": total,
             "completed": completed,
-            "thumbnail": pl.thumbnail,
-            "percent_complete": percent,
+            "thumbnail": pl["thumbnail"],
+            "percent_complete": crud.percent_complete(completed, total),
             "scheduled_start": start,
             "scheduled_end": end
         })
 
-    return result
+    return result, {}
+
+@router.post("/user/me/reschedule")
+async def reschedule_user_playlists(db: AsyncSession = Depends(database.get_async_db), current_user = Depends(get_current_user)):
+    # Replays the saved schedule of every playlist of the user in one batch
+    await write_behind.flush_user(current_user.id)
+    playlist_ids = (await db.execute(
+        select(models.Playlist.id).where(models.Playlist.owner_id == current_user.id)
+    )).scalars().all()
+    rescheduled = await crud.reschedule_playlists(db, playlist_ids)
+    return {"message": f"{rescheduled} videos rescheduled.", "rescheduled": rescheduled}
 
 
 
 # @router.post("/playlist")
-# def create_playlist(data: PlaylistCreateSchema, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+# def create_playlist(data: PlaylistCreateSchema, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
 #     new_playlist = models.Playlist(
 #         title=data.title,
 #         youtube_url=data.youtube_url,
@@ -289,71 +449,173 @@ def user_dashboard(db: Session = Depends(database.get_db), current_user = Depend
 #     db.refresh(new_playlist)
 #     return new_playlist
 
-#     from datetime import timedelta
-
-#     seconds_per_day = int(hours_per_day * 3600)
-#     today = date.today()
-
-#     # Get user's playlist
-#     playlist = db.query(models.Playlist).filter_by(id=playlist_id, owner_id=current_user.id).first()
-#     if not playlist:
-#         raise HTTPException(status_code=404, detail="Playlist not found")
-
-#     # Filter only unfinished videos (Not Started or In Progress)
-#     videos = db.query(models.Video).filter(
-#         models.Video.playlist_id == playlist_id,
-#         models.Video.status.in_(["Not Started", "In Progress"])
-#     ).order_by(models.Video.id).all()
-
-#     if not videos:
-#         return {"message": "No unfinished videos to reschedule."}
+@router.post("/user/me/schedule")
+async def schedule_all_playlists(
+    payload: UserScheduleRequest,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user = Depends(get_current_user)
+):
+    playlists = {
+        p.id: p for p in (await db.execute(
+            select(models.Playlist).where(models.Playlist.owner_id == current_user.id)
+        )).scalars()
+    }
+    plans = payload.playlists
+    if plans is None:
+        plans = [PlaylistPlan(playlist_id=pid) for pid in playlists]
+    if len({plan.playlist_id for plan in plans}) < len(plans):
+        raise HTTPException(status_code=422, detail="Each playlist can appear only once in the plan")
+    missing = [plan.playlist_id for plan in plans if plan.playlist_id not in playlists]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Playlist not found: {missing[0]}")
+
+    await write_behind.flush_user(current_user.id)
+    start = payload.start_date or date.today()
+    weekday_hours, blackout_dates = await crud.user_availability(db, current_user.id)
+    if payload.hours_per_day:
+        weekday_hours = [payload.hours_per_day] * 7
+    if weekday_hours is None:
+        raise HTTPException(status_code=400, detail="Set your availability or pass hours_per_day")
+    timeline = CapacityTimeline(start, weekday_hours, blackout_dates)
+    if not timeline.has_capacity():
+        raise HTTPException(status_code=400, detail="No study time available on any weekday")
+
+    videos = defaultdict(list)
+    for playlist_id, video_id, duration in await crud.user_unfinished_videos(db, [plan.playlist_id for plan in plans]):
+        videos[playlist_id].append((video_id, duration))
+    if not videos:
+        return {"message": "No unfinished videos to schedule.", "rescheduled": 0, "playlists": []}
+
+    # A saved target date or weight is reused unless the request overrides it
+    lanes = []
+    for plan in plans:
+        playlist = playlists[plan.playlist_id]
+        target = plan.target_date
+        if target is None and playlist.schedule_mode in ("target", "user") and playlist.schedule_end_date:
+            target = playlist.schedule_end_date.date()
+        weight = plan.weight or playlist.schedule_weight or 1.0
+        deadline = (target - start).days if target else None
+        lanes.append(PlaylistLane(playlist.id, weight, deadline, videos[playlist.id]))
+
+        playlist.schedule_mode = "user"
+        playlist.schedule_weight = weight
+        playlist.schedule_hours_per_day = payload.hours_per_day
+        playlist.schedule_start_date = datetime.combine(start, datetime.min.time())
+        playlist.schedule_end_date = datetime.combine(target, datetime.min.time()) if target else None
+
+    schedule, finish = schedule_user_playlists(lanes, timeline)
+    # One bulk UPDATE and one commit for every playlist
+    await crud.save_schedule(db, schedule, [lane.playlist_id for lane in lanes])
+
+    summary = []
+    for lane in lanes:
+        target = playlists[lane.playlist_id].schedule_end_date
+        finish_date = finish.get(lane.playlist_id)
+        summary.append({
+            "playlist_id": lane.playlist_id,
+            "weight": lane.weight,
+            "target_date": target,
+            "finish_date": finish_date,
+            "on_time": target is None or finish_date is None or finish_date <= target,
+        })
 
-#     # Reschedule videos one by one
-#     day_offset = 0
-#     used_time = 0
-#     current_day = today
+    return {
+        "message": f"{len(schedule)} videos scheduled across {len(lanes)} playlists starting from {start.isoformat()}",
+        "rescheduled": len(schedule),
+        "playlists": summary,
+    }
 
-#     for video in videos:
-#         if used_time + video.duration_seconds > seconds_per_day:
-#             day_offset += 1
-#             used_time = 0
-#             current_day = today + timedelta(days=day_offset)
+@router.get("/user/me/availability")
+async def get_availability(db: AsyncSession = Depends(database.get_async_db), current_user = Depends(get_current_user)):
+    weekday_hours, blackout_dates = await crud.user_availability(db, current_user.id)
+    return {"weekday_hours": weekday_hours, "blackout_dates": blackout_dates}
 
-#         scheduled_datetime = datetime.combine(current_day, datetime.min.time())
-#         video.scheduled_date = scheduled_datetime
-#         used_time += video.duration_seconds
+@router.put("/user/me/availability")
+async def set_availability(
+    payload: AvailabilitySchema,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user = Depends(get_current_user)
+):
+    await crud.set_user_availability(db, current_user.id, payload.weekday_hours, payload.blackout_dates)
+    return {"message": "Availability updated successfully"}
+
+@router.post("/playlist/{playlist_id}/reschedule-remaining")
+async def reschedule_remaining(
+    playlist_id: int,
+    start_date: Optional[date] = None,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user = Depends(get_current_user)
+):
+    playlist = (await db.execute(
+        select(models.Playlist).where(
+            models.Playlist.id == playlist_id,
+            models.Playlist.owner_id == current_user.id
+        )
+    )).scalars().first()
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Playlist not found")
 
-#     db.commit()
+    start = start_date or date.today()
+    # No availability saved yet: fall back to the playlist's hours/day plan
+    timeline = await crud.capacity_timeline(db, current_user.id, start, playlist.schedule_hours_per_day)
+    if timeline is None:
+        raise HTTPException(status_code=400, detail="Set your availability or schedule the playlist by hours first")
+    if not timeline.has_capacity():
+        raise HTTPException(status_code=400, detail="No study time available on any weekday")
+
+    # Saved so later replays (user reschedule, sync) rebuild from the availability too
+    playlist.schedule_mode = "capacity"
+    playlist.schedule_start_date = datetime.combine(start, datetime.min.time())
+    playlist.schedule_end_date = None
+
+    # Only unfinished videos move, and only the ones whose date changes are written
+    await write_behind.flush([playlist_id])
+    videos = await crud.unfinished_videos(db, playlist_id)
+    current = {v.id: v.scheduled_date for v in videos}
+    changed = [(vid, day) for vid, day in schedule_by_capacity(videos, timeline) if current[vid] != day]
+    await crud.save_schedule(db, changed, [playlist_id])
+    await db.commit()
+    if not videos:
+        return {"message": "No unfinished videos to reschedule.", "rescheduled": 0}
 
-#     return {
-#         "message": f"{len(videos)} videos rescheduled starting from {today.isoformat()}",
-#         "start_date": today.isoformat(),
-#         "daily_limit_minutes": int(hours_per_day * 60)
-#     }
+    return {
+        "message": f"{len(changed)} videos rescheduled starting from {start.isoformat()}",
+        "start_date": start.isoformat(),
+        "rescheduled": len(changed)
+    }
 
 @router.get("/playlist/{playlist_id}")
-def get_playlist_details(playlist_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    playlist = db.query(models.Playlist).filter(
-        models.Playlist.id == playlist_id,
-        models.Playlist.owner_id == current_user.id
-    ).first()
+async def get_playlist_details(playlist_id: int, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    playlist = (await db.execute(
+        select(models.Playlist).where(
+            models.Playlist.id == playlist_id,
+            models.Playlist.owner_id == current_user.id
+        )
+    )).scalars().first()
 
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
 
-    videos = db.query(models.Video).filter(models.Video.playlist_id == playlist_id).all()
-    total = len(videos)
-    completed = sum(1 for v in videos if v.status == "Completed")
-    percent = round((completed / total) * 100, 2) if total else 0
+    await write_behind.flush([playlist_id])
+    stats = await crud.playlist_stats(db, playlist_id)
+    total = stats["total_videos"]
+    completed = stats["completed_videos"]
 
     # Calendar range
-    dates = [v.scheduled_date for v in videos if v.scheduled_date]
-    start = min(dates).date().isoformat() if dates else None
-    end = max(dates).date().isoformat() if dates else None
+    start, end = crud.date_range(stats)
 
     return {
         "id": playlist.id,
         "title": playlist.title,
         "youtube_url": playlist.youtube_url,
         "thumbnail": playlist.thumbnail,
+        "total_videos": total,
+        "completed": completed,
+        "percent_complete": crud.percent_complete(completed, total),
+        "scheduled_start": start,
+        "scheduled_end": end
     }
+
+@router.get("/response-cache/stats")
+def response_cache_stats(current_user = Depends(get_current_user)):
+    return response_cache.stats()
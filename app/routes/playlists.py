@@ -1,9 +1,15 @@
+import asyncio
+import httpx
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import database, models
-from app.youtube_api import get_playlist_videos
+from app.import_jobs import ImportJobQueue, get_import_jobs
+from app.playlist_sync import sync_playlist
+from app.youtube_api import get_http_client
+from app.youtube_cache import YouTubeAPIError, youtube_cache
 import re
-from app.auth import get_current_user
+from app.auth import get_current_user, AuthenticatedUser
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/playlists", tags=["Playlists"])
@@ -18,45 +24,72 @@ def extract_playlist_id(url: str) -> str:
 class PlaylistImportRequest(BaseModel):
     youtube_url: str
 
-@router.post("/import")
+@router.post("/import", status_code=202)
 async def import_playlist(
     payload: PlaylistImportRequest,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    jobs: ImportJobQueue = Depends(get_import_jobs)
 ):
     playlist_id = extract_playlist_id(payload.youtube_url)
     if not playlist_id:
         raise HTTPException(status_code=400, detail="Invalid playlist URL")
 
-    data = await get_playlist_videos(playlist_id)
-    if not data or not data["videos"]:
-        raise HTTPException(status_code=404, detail="No videos found")
-
-    playlist = models.Playlist(
-        title=data["playlist"]["title"],
-        thumbnail=data["playlist"]["thumbnail"],
-        youtube_url=payload.youtube_url,
-        total_videos=len(data["videos"]),
-        owner_id=current_user.id
-    )
-    db.add(playlist)
-    db.commit()
-    db.refresh(playlist)
-
-    for video in data["videos"]:
-        db.add(models.Video(
-            playlist_id=playlist.id,
-            title=video["title"],
-            duration_seconds=video["duration_seconds"],
-            thumbnail=video["thumbnail"],
-            youtube_url=video["youtube_url"]
-        ))
-    db.commit()
+    try:
+        job = jobs.submit(current_user.id, payload.youtube_url, playlist_id)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Too many imports in progress, try again later")
 
     return {
-        "message": "Playlist imported successfully",
-        "playlist_id": playlist.id,
-        "playlist_title": data["playlist"]["title"],
-        "playlist_thumbnail": data["playlist"]["thumbnail"],
-        "videos": data["videos"]
+        "message": "Playlist import started",
+        "job_id": job.id,
+        "state": job.state,
+        "status_url": f"{router.prefix}/import/{job.id}"
     }
+
+
+@router.get("/import/{job_id}")
+def get_import_status(
+    job_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    jobs: ImportJobQueue = Depends(get_import_jobs)
+):
+    job = jobs.get(job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
+
+
+@router.post("/{playlist_id}/sync")
+async def sync_imported_playlist(
+    playlist_id: int,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    playlist = (await db.execute(
+        select(models.Playlist).where(
+            models.Playlist.id == playlist_id,
+            models.Playlist.owner_id == current_user.id
+        )
+    )).scalars().first()
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+
+    # Playlists imported before youtube_id was stored only have the URL
+    youtube_id = playlist.youtube_id or extract_playlist_id(playlist.youtube_url or "")
+    if not youtube_id:
+        raise HTTPException(status_code=400, detail="Playlist has no YouTube id")
+    playlist.youtube_id = youtube_id
+
+    try:
+        result = await sync_playlist(db, playlist, youtube_id, client)
+    except (YouTubeAPIError, httpx.HTTPError) as exc:
+        # Nothing is written unless the whole item list was fetched
+        await db.rollback()
+        raise HTTPException(status_code=502, detail=f"Could not fetch the playlist from YouTube: {exc}")
+    return {"message": "Playlist synced", "playlist_id": playlist.id, **result}
+
+
+@router.get("/youtube-cache/stats")
+def youtube_cache_stats(current_user: AuthenticatedUser = Depends(get_current_user)):
+    return youtube_cache.stats()
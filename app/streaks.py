@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.crud import dialect_insert
+
+# playlist_id used for the user-wide activity and streak rows
+ALL_PLAYLISTS = 0
+
+
+def streak_from_days(days):
+    """Walk sorted, distinct activity days once.
+
+    Returns (current_streak, max_streak, last_day) where current_streak is
+    the run of consecutive days ending on last_day.
+    """
+    current = best = 0
+    previous = None
+    for day in days:
+        current = current + 1 if previous is not None and day == previous + timedelta(days=1) else 1
+        best = max(best, current)
+        previous = day
+    return current, best, previous
+
+
+def streak_summary(streak: models.WatchStreak, today: date = None):
+    # A streak is still current when the last active day was today or yesterday
+    if streak is None or streak.last_day is None:
+        return {"current_streak": 0, "max_streak": 0, "last_active": None}
+    today = today or datetime.utcnow().date()
+    current = streak.current_streak if streak.last_day >= today - timedelta(days=1) else 0
+    return {"current_streak": current, "max_streak": streak.max_streak, "last_active": streak.last_day}
+
+
+async def get_streak(db: AsyncSession, user_id: int, playlist_id: int = ALL_PLAYLISTS):
+    return streak_summary(await db.get(models.WatchStreak, (playlist_id, user_id)))
+
+
+async def record_completions(db: AsyncSession, user_id: int, completions, completed_at: datetime):
+    # Adds completed videos, given as (playlist_id, duration_seconds), to the day's
+    # activity and advances the playlist and user-wide streaks; part of the caller's transaction
+    day = completed_at.date()
+    totals = {}
+    for playlist_id, duration_seconds in completions:
+        for scope in (playlist_id, ALL_PLAYLISTS):
+            videos, seconds = totals.get(scope, (0, 0))
+            totals[scope] = (videos + 1, seconds + (duration_seconds or 0))
+    if not totals:
+        return
+
+    activity = models.WatchActivity
+    stmt = dialect_insert(db, activity)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "playlist_id", "day"],
+        set_={
+            "videos_completed": activity.videos_completed + stmt.excluded.videos_completed,
+            "seconds_completed": activity.seconds_completed + stmt.excluded.seconds_completed,
+        },
+    )
+    await db.execute(stmt, [
+        {
+            "user_id": user_id,
+            "playlist_id": scope,
+            "day": day,
+            "videos_completed": videos,
+            "seconds_completed": seconds,
+        }
+        for scope, (videos, seconds) in totals.items()
+    ])
+
+    added = False
+    for scope in totals:
+        streak = await db.get(models.WatchStreak, (scope, user_id))
+        if streak is None:
+            streak = models.WatchStreak(playlist_id=scope, user_id=user_id, current_streak=0, max_streak=0)
+            db.add(streak)
+            added = True
+        if streak.last_day is not None and day <= streak.last_day:
+            # Same day (or a clock step back): the run does not change
+            continue
+        if streak.last_day is not None and day == streak.last_day + timedelta(days=1):
+            streak.current_streak += 1
+        else:
+            streak.current_streak = 1
+        streak.max_streak = max(streak.max_streak or 0, streak.current_streak)
+        streak.last_day = day
+    if added:
+        # Pending rows are not found by db.get(); flush so the next completion sees them
+        await db.flush()
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict, defaultdict, namedtuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, progress
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_INTERVAL_SECONDS = float(os.getenv("WRITE_BEHIND_INTERVAL_SECONDS", "0.5"))
+# A flush starts as soon as this many videos have pending changes; writers wait at twice as many
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "1000"))
+# Video -> (owner, playlist) entries kept so buffered writes skip the ownership query
+WRITE_BEHIND_OWNER_CACHE_SIZE = int(os.getenv("WRITE_BEHIND_OWNER_CACHE_SIZE", "10000"))
+
+# A coalesced change to one video; None leaves the field unchanged
+PendingUpdate = namedtuple("PendingUpdate", "id user_id playlist_id status notes")
+
+
+def _merge(older: PendingUpdate, newer: PendingUpdate):
+    return newer._replace(
+        status=older.status if newer.status is None else newer.status,
+        notes=older.notes if newer.notes is None else newer.notes,
+    )
+
+
+class WriteBehindBuffer:
+    """Coalesces video status/notes changes in memory and writes them in batches.
+
+    Each video keeps only its latest status and latest notes (last write
+    wins per field). Pending changes are flushed in one transaction every
+    `interval` seconds, as soon as `max_pending` videos are waiting, before
+    any read of a playlist's aggregates, and on shutdown. Reads of video
+    rows see pending values through overlay().
+
+    Crash safety: a change is durable once its flush commits, not when the
+    request returns. A crash or kill -9 loses whatever was buffered, at
+    most `interval` seconds or `max_pending` videos of changes; a graceful
+    shutdown flushes everything. A failed flush puts its changes back
+    under any newer ones and is retried on the next tick. completed_at and
+    the streak day are the flush time, and a video completed and reset
+    again within one interval records no completion.
+
+    The buffer lives in one process. With several workers, read-your-writes
+    only holds for requests that reach the worker that took the write.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, enabled: bool = WRITE_BEHIND_ENABLED,
+                 interval: float = WRITE_BEHIND_INTERVAL_SECONDS, max_pending: int = WRITE_BEHIND_MAX_PENDING,
+                 owner_cache_size: int = WRITE_BEHIND_OWNER_CACHE_SIZE):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.interval = interval
+        self.max_pending = max_pending
+        self.owner_cache_size = owner_cache_size
+        self.pending = {}
+        self._owners = OrderedDict()
+        self._by_playlist = defaultdict(set)
+        # Taken by the flush in progress and not committed yet: still read through overlay()
+        self._flushing = {}
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.enqueued = 0
+        self.flushes = 0
+        self.videos_written = 0
+        self.failed_flushes = 0
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.pending),
+            "enqueued": self.enqueued,
+            "flushes": self.flushes,
+            "videos_written": self.videos_written,
+            "failed_flushes": self.failed_flushes,
+        }
+
+    def start(self):
+        # Bound to the running loop: a buffer can outlive one app lifespan (tests, reloads)
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            # Holding the lock, the flusher is between flushes: cancelling one midway
+            # would drop the batch it took and leave its transaction open
+            async with self._lock:
+                self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def has_pending(self, playlist_id: int = None):
+        if playlist_id is None:
+            return bool(self.pending or self._flushing)
+        return bool(self._by_playlist.get(playlist_id)) \
+            or any(update.playlist_id == playlist_id for update in self._flushing.values())
+
+    def _put(self, update: PendingUpdate):
+        older = self.pending.get(update.id)
+        self.pending[update.id] = _merge(older, update) if older else update
+        self._by_playlist[update.playlist_id].add(update.id)
+
+    async def playlist_of(self, db: AsyncSession, user_id: int, video_id: int):
+        # Playlist of a video owned by `user_id`, or None. A video never changes owner,
+        # so the answer is cached until the row is deleted: videos.id is a rowid and is
+        # reused, so whatever deletes videos calls forget() after its commit.
+        owner = self._owners.get(video_id)
+        if owner is None:
+            owner = (await db.execute(
+                select(models.Playlist.owner_id, models.Video.playlist_id)
+                .join(models.Playlist).where(models.Video.id == video_id)
+            )).first()
+            if owner is None:
+                return None
+            self._owners[video_id] = tuple(owner)
+            if len(self._owners) > self.owner_cache_size:
+                self._owners.popitem(last=False)
+        else:
+            self._owners.move_to_end(video_id)
+        owner_id, playlist_id = owner
+        return playlist_id if owner_id == user_id else None
+
+    def forget(self, video_ids):
+        # Deleted videos: their ids can come back as new rows, drop the cached owner and any pending change
+        for video_id in video_ids:
+            self._owners.pop(video_id, None)
+            update = self.pending.pop(video_id, None)
+            if update is not None:
+                self._by_playlist[update.playlist_id].discard(video_id)
+
+    async def enqueue(self, user_id: int, playlist_id: int, video_id: int, status=None, notes=None):
+        # Ownership is checked by the caller (playlist_of); the row is written on the next flush
+        self._put(PendingUpdate(video_id, user_id, playlist_id, status, notes))
+        self.enqueued += 1
+        if len(self.pending) >= self.max_pending:
+            self._wake.set()
+        if len(self.pending) >= 2 * self.max_pending:
+            # Backpressure: the flusher is not keeping up
+            await self.flush()
+
+    def overlay(self, item: dict):
+        # Pending values for a video row read from the database, newest last
+        for update in (self._flushing.get(item["id"]), self.pending.get(item["id"])):
+            if update is not None:
+                if update.status is not None:
+                    item["status"] = update.status
+                if update.notes is not None and "notes" in item:
+                    item["notes"] = update.notes
+        return item
+
+    def _take(self, playlist_ids):
+        if playlist_ids is None:
+            taken = list(self.pending.values())
+            self.pending = {}
+            self._by_playlist.clear()
+            return taken
+        taken = []
+        for playlist_id in playlist_ids:
+            for video_id in self._by_playlist.pop(playlist_id, ()):
+                taken.append(self.pending.pop(video_id))
+        return taken
+
+    async def flush(self, playlist_ids=None):
+        """Write pending changes, all of them or those of `playlist_ids`."""
+        # A flush in progress may hold these playlists' changes: wait for it before reading
+        if playlist_ids is not None and not self._lock.locked() \
+                and not any(self._by_playlist.get(pid) for pid in playlist_ids):
+            return 0
+        async with self._lock:
+            taken = self._take(playlist_ids)
+            if not taken:
+                return 0
+            by_user = defaultdict(list)
+            for update in taken:
+                by_user[update.user_id].append(update)
+            self._flushing = {update.id: update for update in taken}
+            try:
+                async with self.session_factory() as db:
+                    for user_id, updates in by_user.items():
+                        await progress.apply_video_updates(db, user_id, updates)
+                    await db.commit()
+            except Exception:
+                self.failed_flushes += 1
+                # Changes made while the flush ran are newer and stay on top
+                for update in taken:
+                    newer = self.pending.get(update.id)
+                    self.pending[update.id] = _merge(update, newer) if newer else update
+                    self._by_playlist[update.playlist_id].add(update.id)
+                raise
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            self.videos_written += len(taken)
+            return len(taken)
+
+    async def flush_user(self, user_id: int):
+        # Before reads of user-wide aggregates (streaks, dashboard, user schedule)
+        playlist_ids = {update.playlist_id for update in self.pending.values() if update.user_id == user_id}
+        await self.flush(playlist_ids)
+
+    async def _run(self):
+        # Only cancellation ends the loop: a failed tick is logged and the next one retries
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                if self.pending:
+                    await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush of %d videos failed", len(self.pending))
+                await asyncio.sleep(self.interval)
+
+
+write_behind = WriteBehindBuffer()
@@ -1,7 +1,10 @@
+import asyncio
 import os
 import httpx
+from fastapi import Request
 from dotenv import load_dotenv
 import isodate
+from app.youtube_cache import YouTubeAPIError, check_response, youtube_cache
 
 load_dotenv()
 API_KEY = os.getenv("YOUTUBE_API_KEY")
@@ -10,93 +13,196 @@ YOUTUBE_PLAYLIST_URL = "https://www.googleapis.com/youtube/v3/playlistItems"
 YOUTUBE_VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
 YOUTUBE_PLAYLIST_METADATA_URL = "https://www.googleapis.com/youtube/v3/playlists"
 
+# Upper bound on in-flight YouTube requests for a single import
+MAX_CONCURRENT_REQUESTS = int(os.getenv("YOUTUBE_MAX_CONCURRENT_REQUESTS", "8"))
+
+# Shared client settings, one pool for the whole app (see main.lifespan)
+HTTP_MAX_CONNECTIONS = int(os.getenv("YOUTUBE_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("YOUTUBE_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("YOUTUBE_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("YOUTUBE_HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("YOUTUBE_HTTP_CONNECT_TIMEOUT", "5"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+def create_http_client(**kwargs) -> httpx.AsyncClient:
+    kwargs.setdefault("http2", HTTP2_AVAILABLE)
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        **kwargs,
+    )
+
+class FetchMeter:
+    # Counts YouTube requests and response body bytes for one operation
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+
+    def record(self, res: httpx.Response):
+        self.requests += 1
+        self.bytes += len(res.content)
+
+# Dependency: the app-scoped client created in the lifespan hook
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
 # Convert ISO 8601 duration to seconds
 def parse_duration(iso_duration):
     duration = isodate.parse_duration(iso_duration)
     return int(duration.total_seconds())
 
+async def _fetch_playlist_metadata(client: httpx.AsyncClient, playlist_id: str):
+    data = await youtube_cache.get_json(client, f"playlists:{playlist_id}", YOUTUBE_PLAYLIST_METADATA_URL, {
+        "part": "snippet",
+        "id": playlist_id,
+        "key": API_KEY
+    })
+    if "items" not in data or not data["items"]:
+        return None
+
+    snippet = data["items"][0]["snippet"]
+    return {
+        "title": snippet["title"],
+        "thumbnail": snippet["thumbnails"].get("high", {}).get("url", "")
+    }
+
 # NEW: Fetch playlist title + thumbnail
-async def get_playlist_metadata(playlist_id: str):
+async def get_playlist_metadata(playlist_id: str, client: httpx.AsyncClient | None = None):
     api_key = os.getenv("YOUTUBE_API_KEY")  # 🔑 Make sure this is set
     if not api_key:
         raise Exception("Missing YouTube API key")
-        
-    async with httpx.AsyncClient() as client:
-        res = await client.get(YOUTUBE_PLAYLIST_METADATA_URL, params={
-            "part": "snippet",
-            "id": playlist_id,
+
+    if client is not None:
+        return await _fetch_playlist_metadata(client, playlist_id)
+    async with create_http_client() as client:
+        return await _fetch_playlist_metadata(client, playlist_id)
+
+async def _fetch_durations(client: httpx.AsyncClient, limiter: asyncio.Semaphore, video_ids: list[str], meter: FetchMeter | None = None):
+    durations = await youtube_cache.get_durations(video_ids)
+    missing = [vid for vid in video_ids if vid not in durations]
+    if not missing:
+        return durations
+    async with limiter:
+        res = await client.get(YOUTUBE_VIDEOS_URL, params={
+            "part": "contentDetails",
+            "id": ",".join(missing),
             "key": API_KEY
         })
-        data = res.json()
-        if "items" not in data or not data["items"]:
-            return None
-
-        snippet = data["items"][0]["snippet"]
-        return {
-            "title": snippet["title"],
-            "thumbnail": snippet["thumbnails"].get("high", {}).get("url", "")
-        }
+    if meter:
+        meter.record(res)
+    # A failed request raises; only ids missing from a successful response are private/deleted
+    check_response(res)
+    fetched = {
+        item["id"]: parse_duration(item["contentDetails"]["duration"])
+        for item in res.json().get("items", [])
+    }
+    await youtube_cache.store_durations(fetched)
+    durations.update(fetched)
+    return durations
 
-# MAIN FUNCTION
-async def get_playlist_videos(playlist_id: str):
-    video_ids = []
+# duration_tasks=None only lists the items, without looking up durations
+async def _fetch_playlist_pages(client: httpx.AsyncClient, limiter: asyncio.Semaphore, playlist_id: str,
+                                duration_tasks: list | None, on_page=None, revalidate: bool = False,
+                                meter: FetchMeter | None = None):
     video_meta = []
+    next_page_token = None
+    while True:
+        params = {
+            "part": "snippet",
+            "maxResults": 50,
+            "playlistId": playlist_id,
+            "key": API_KEY,
+            "pageToken": next_page_token
+        }
+        async with limiter:
+            data = await youtube_cache.get_json(
+                client, f"playlistItems:{playlist_id}:{next_page_token or ''}", YOUTUBE_PLAYLIST_URL, params,
+                revalidate=revalidate, meter=meter
+            )
+
+        if "items" not in data:
+            # A truncated page must not end the chain early: callers treat the result as complete
+            raise YouTubeAPIError(200, "/youtube/v3/playlistItems", "page without items")
 
-    playlist_info = await get_playlist_metadata(playlist_id)
-
-    async with httpx.AsyncClient() as client:
-        next_page_token = None
-        while True:
-            params = {
-                "part": "snippet",
-                "maxResults": 50,
-                "playlistId": playlist_id,
-                "key": API_KEY,
-                "pageToken": next_page_token
-            }
-            res = await client.get(YOUTUBE_PLAYLIST_URL, params=params)
-            data = res.json()
-
-            for item in data.get("items", []):
-                snippet = item["snippet"]
-                video_id = snippet["resourceId"]["videoId"]
-                title = snippet["title"]
-                thumbnail = snippet["thumbnails"].get("high", {}).get("url", "")
-
-                video_ids.append(video_id)
-                video_meta.append({
-                    "video_id": video_id,
-                    "title": title,
-                    "thumbnail": thumbnail,
-                    "youtube_url": f"https://www.youtube.com/watch?v={video_id}" 
-                })
-
-            next_page_token = data.get("nextPageToken")
-            if not next_page_token:
-                break
-
-        videos = []
-        for i in range(0, len(video_ids), 50):
-            ids_chunk = video_ids[i:i+50]
-            res = await client.get(YOUTUBE_VIDEOS_URL, params={
-                "part": "contentDetails",
-                "id": ",".join(ids_chunk),
-                "key": API_KEY
+        page_ids = []
+        for item in data["items"]:
+            snippet = item["snippet"]
+            video_id = snippet["resourceId"]["videoId"]
+            page_ids.append(video_id)
+            video_meta.append({
+                "video_id": video_id,
+                "title": snippet["title"],
+                "thumbnail": snippet["thumbnails"].get("high", {}).get("url", ""),
+                "youtube_url": f"https://www.youtube.com/watch?v={video_id}"
             })
-            durations = res.json()["items"]
-            for j, item in enumerate(durations):
-                duration = parse_duration(item["contentDetails"]["duration"])
-                video_info = video_meta[i + j]
-                videos.append({
-                    "video_id": video_info["video_id"],
-                    "title": video_info["title"],
-                    "thumbnail": video_info["thumbnail"],
-                    "duration_seconds": duration,
-                    "youtube_url": f"https://www.youtube.com/watch?v={video_info['video_id']}"
-
-                })
-
-        return {
-            "playlist": playlist_info,
-            "videos": videos
-        }
+
+        # A page holds at most 50 items, which is exactly one videos request
+        if duration_tasks is not None:
+            duration_tasks.append(asyncio.create_task(_fetch_durations(client, limiter, page_ids, meter)))
+        if on_page:
+            on_page(len(page_ids))
+
+        next_page_token = data.get("nextPageToken")
+        if not next_page_token:
+            return video_meta
+
+async def _collect_playlist_videos(client: httpx.AsyncClient, playlist_id: str, on_page=None):
+    limiter = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    metadata_task = asyncio.create_task(_fetch_playlist_metadata(client, playlist_id))
+    duration_tasks = []
+    try:
+        video_meta = await _fetch_playlist_pages(client, limiter, playlist_id, duration_tasks, on_page)
+        playlist_info = await metadata_task
+        durations = {}
+        for chunk in await asyncio.gather(*duration_tasks):
+            durations.update(chunk)
+    except BaseException:
+        tasks = [metadata_task, *duration_tasks]
+        for task in tasks:
+            task.cancel()
+        # Nothing of this import may still be running once the caller sees it fail
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    videos = [
+        {**video, "duration_seconds": durations[video["video_id"]]}
+        for video in video_meta
+        if video["video_id"] in durations
+    ]
+    return {
+        "playlist": playlist_info,
+        "videos": videos
+    }
+
+# MAIN FUNCTION
+# Metadata, playlist pages and duration lookups are pipelined: each page's
+# durations request is sent as soon as that page arrives.
+# Pass the shared client; a throwaway one is only opened for ad-hoc calls.
+# on_page(videos_on_page) is called as each playlistItems page arrives.
+async def get_playlist_videos(playlist_id: str, client: httpx.AsyncClient | None = None, on_page=None):
+    if client is not None:
+        return await _collect_playlist_videos(client, playlist_id, on_page)
+    async with create_http_client() as client:
+        return await _collect_playlist_videos(client, playlist_id, on_page)
+
+# Current item list of a playlist, always revalidated so unchanged pages cost a 304
+async def get_playlist_items(playlist_id: str, client: httpx.AsyncClient, meter: FetchMeter | None = None):
+    limiter = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return await _fetch_playlist_pages(client, limiter, playlist_id, None, revalidate=True, meter=meter)
+
+async def get_video_durations(video_ids: list[str], client: httpx.AsyncClient, meter: FetchMeter | None = None):
+    limiter = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    durations = {}
+    chunks = [video_ids[i:i + 50] for i in range(0, len(video_ids), 50)]
+    for chunk in await asyncio.gather(*[_fetch_durations(client, limiter, ids, meter) for ids in chunks]):
+        durations.update(chunk)
+    return durations
@@ -0,0 +1,217 @@
+import asyncio
+import functools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+import httpx
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from app import models
+from app.database import AsyncSessionLocal
+
+# Playlist pages change when the owner edits the playlist; durations never do
+CACHE_TTL_SECONDS = int(os.getenv("YOUTUBE_CACHE_TTL_SECONDS", "3600"))
+DURATION_TTL_SECONDS = int(os.getenv("YOUTUBE_DURATION_TTL_SECONDS", str(30 * 24 * 3600)))
+CACHE_ENABLED = os.getenv("YOUTUBE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+# Expired pages are kept this long for their ETag, then purged (at most once per interval)
+CACHE_RETENTION_SECONDS = int(os.getenv("YOUTUBE_CACHE_RETENTION_SECONDS", str(7 * 24 * 3600)))
+PURGE_INTERVAL_SECONDS = float(os.getenv("YOUTUBE_CACHE_PURGE_INTERVAL_SECONDS", "3600"))
+
+
+class YouTubeAPIError(Exception):
+    """A YouTube Data API request did not return a usable response."""
+
+    def __init__(self, status_code: int, path: str, reason: str = None):
+        self.status_code = status_code
+        self.path = path
+        super().__init__(f"YouTube API {path} returned {status_code}" + (f" ({reason})" if reason else ""))
+
+
+def check_response(res: httpx.Response):
+    # Quota, auth and 5xx bodies must not be read as a page without items
+    if res.status_code != 200:
+        reason = None
+        try:
+            reason = res.json()["error"]["errors"][0]["reason"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            pass
+        # The path only: the query string carries the API key
+        raise YouTubeAPIError(res.status_code, res.request.url.path, reason)
+
+
+def _uninterrupted(method):
+    # aiosqlite runs a statement in its own thread whether or not the awaiting task is
+    # cancelled, and a session torn down halfway can keep SQLite's write lock. A cancelled
+    # caller (an import failing on another page, shutdown) lets the session finish instead.
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.shield(method(*args, **kwargs))
+    return wrapper
+
+
+class YouTubeCache:
+    """Persistent cache for YouTube Data API responses.
+
+    Fresh entries are served without a request. Expired entries are
+    revalidated with If-None-Match, so an unchanged page costs a 304.
+    Entries expired for longer than the retention are purged.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, enabled: bool = CACHE_ENABLED,
+                 ttl: int = CACHE_TTL_SECONDS, duration_ttl: int = DURATION_TTL_SECONDS,
+                 retention: int = CACHE_RETENTION_SECONDS, purge_interval: float = PURGE_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.ttl = timedelta(seconds=ttl)
+        self.duration_ttl = timedelta(seconds=duration_ttl)
+        self.retention = timedelta(seconds=retention)
+        self.purge_interval = purge_interval
+        self._last_purge = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.duration_hits = 0
+        self.duration_misses = 0
+        self.purged = 0
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "duration_hits": self.duration_hits,
+            "duration_misses": self.duration_misses,
+            "purged": self.purged,
+        }
+
+    @_uninterrupted
+    async def _load(self, keys: list[str]):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(models.YouTubeCacheEntry).where(models.YouTubeCacheEntry.key.in_(keys))
+            )
+            return {entry.key: entry for entry in result.scalars()}
+
+    @_uninterrupted
+    async def _store(self, entries: list[dict]):
+        async with self.session_factory() as db:
+            dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+            stmt = dialect.insert(models.YouTubeCacheEntry)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[models.YouTubeCacheEntry.key],
+                set_={column: stmt.excluded[column] for column in ("etag", "body", "fetched_at", "expires_at")},
+            )
+            await db.execute(stmt, [{"etag": None, **entry} for entry in entries])
+            await db.commit()
+
+    @_uninterrupted
+    async def _touch(self, key: str, expires_at: datetime):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(models.YouTubeCacheEntry)
+                .where(models.YouTubeCacheEntry.key == key)
+                .values(expires_at=expires_at)
+            )
+            await db.commit()
+
+    @_uninterrupted
+    async def clear(self):
+        async with self.session_factory() as db:
+            await db.execute(delete(models.YouTubeCacheEntry))
+            await db.commit()
+
+    # Deletes entries past expiry plus retention; returns how many were removed
+    @_uninterrupted
+    async def purge(self):
+        cutoff = datetime.utcnow() - self.retention
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(models.YouTubeCacheEntry).where(models.YouTubeCacheEntry.expires_at < cutoff)
+            )
+            await db.commit()
+        self._last_purge = time.monotonic()
+        self.purged += result.rowcount
+        return result.rowcount
+
+    # Called when an import starts: the table only grows from imports and syncs
+    async def purge_if_due(self):
+        if not self.enabled:
+            return 0
+        if self._last_purge is not None and time.monotonic() - self._last_purge < self.purge_interval:
+            return 0
+        return await self.purge()
+
+    # revalidate=True skips the fresh-entry shortcut and always asks YouTube (If-None-Match)
+    async def get_json(self, client: httpx.AsyncClient, key: str, url: str, params: dict,
+                       revalidate: bool = False, meter=None):
+        if not self.enabled:
+            res = await client.get(url, params=params)
+            if meter:
+                meter.record(res)
+            check_response(res)
+            return res.json()
+
+        entry = (await self._load([key])).get(key)
+        now = datetime.utcnow()
+        if entry and entry.expires_at and entry.expires_at > now and not revalidate:
+            self.hits += 1
+            return json.loads(entry.body)
+
+        headers = {"If-None-Match": entry.etag} if entry and entry.etag else {}
+        res = await client.get(url, params=params, headers=headers)
+        if meter:
+            meter.record(res)
+        if res.status_code == 304:
+            if entry is None:
+                # Nothing was sent to revalidate, so there is no body to fall back on
+                raise YouTubeAPIError(304, res.request.url.path, "not modified without a cached entry")
+            self.revalidated += 1
+            await self._touch(key, now + self.ttl)
+            return json.loads(entry.body)
+
+        check_response(res)
+        self.misses += 1
+        await self._store([{
+            "key": key,
+            "etag": res.headers.get("ETag"),
+            "body": res.text,
+            "fetched_at": now,
+            "expires_at": now + self.ttl,
+        }])
+        return res.json()
+
+    async def get_durations(self, video_ids: list[str]):
+        if not self.enabled or not video_ids:
+            return {}
+        entries = await self._load([f"duration:{vid}" for vid in video_ids])
+        now = datetime.utcnow()
+        durations = {
+            key.split(":", 1)[1]: int(entry.body)
+            for key, entry in entries.items()
+            if entry.expires_at and entry.expires_at > now
+        }
+        self.duration_hits += len(durations)
+        self.duration_misses += len(video_ids) - len(durations)
+        return durations
+
+    async def store_durations(self, durations: dict[str, int]):
+        if not self.enabled or not durations:
+            return
+        now = datetime.utcnow()
+        await self._store([
+            {
+                "key": f"duration:{vid}",
+                "body": str(seconds),
+                "fetched_at": now,
+                "expires_at": now + self.duration_ttl,
+            }
+            for vid, seconds in durations.items()
+        ])
+
+
+youtube_cache = YouTubeCache()
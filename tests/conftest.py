@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# The app reads its configuration at import time: point it at a scratch database first
+_TMP_DIR = tempfile.mkdtemp(prefix="ytstudy-tests-")
+DB_PATH = os.path.join(_TMP_DIR, "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["WRITE_BEHIND_ENABLED"] = "false"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")  # the lowest cost bcrypt accepts
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import models, youtube_api
+from app.auth import create_access_token, user_cache
+from app.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.rebuild_stats import rebuild
+from app.response_cache import response_cache
+from app.write_behind import write_behind
+from app.youtube_cache import youtube_cache
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    user_cache.clear()
+    response_cache.clear()
+    write_behind.pending.clear()
+    write_behind._by_playlist.clear()
+    write_behind._owners.clear()
+    youtube_cache.reset_stats()
+    youtube_cache._last_purge = None
+    yield
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def seed():
+    # seed(playlists=2, videos=5) -> user with ids, auth headers and the playlist/video ids
+    users = iter(range(1, 10_000))
+
+    def seed(playlists: int = 1, videos: int = 5, completed: int = 0, scheduled: bool = True):
+        db = SessionLocal()
+        user = models.User(email=f"user{next(users)}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        playlist_ids, video_ids = [], []
+        for p in range(playlists):
+            playlist = models.Playlist(title=f"playlist {p}", youtube_url="u", total_videos=videos, owner_id=user_id)
+            db.add(playlist)
+            db.commit()
+            playlist_ids.append(playlist.id)
+            for i in range(videos):
+                youtube_id = f"vid{i}"
+                if db.get(models.CatalogVideo, youtube_id) is None:
+                    db.add(models.CatalogVideo(
+                        youtube_id=youtube_id, title=f"video {i}", thumbnail="t",
+                        youtube_url=f"https://www.youtube.com/watch?v={youtube_id}", duration_seconds=600 * (i + 1),
+                    ))
+                video = models.Video(
+                    playlist_id=playlist.id, catalog_id=youtube_id, position=i, duration_seconds=600 * (i + 1),
+                    status="Completed" if i < completed else "Not Started",
+                    scheduled_date=datetime(2025, 1, 1) + timedelta(days=i) if scheduled else None,
+                )
+                db.add(video)
+                db.commit()
+                video_ids.append(video.id)
+        db.close()
+        asyncio.run(rebuild())
+        token = create_access_token({"sub": str(user_id)})
+        return SimpleNamespace(
+            id=user_id, headers={"Authorization": f"Bearer {token}"},
+            playlist_ids=playlist_ids, video_ids=video_ids,
+        )
+
+    return seed
+
+
+@pytest.fixture
+def statements():
+    # SQL statements (with parameters) sent by the API while the test runs
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters, executemany))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield captured
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+class FakeYouTube:
+    """YouTube Data API stand-in, served to httpx through MockTransport.
+
+    Playlist pages and video durations come from `playlists`. `fail(resource, ...)`
+    answers a resource with an API error, `latency` delays a resource's responses, and
+    responses carry an ETag that turns a matching If-None-Match into an empty 304.
+    """
+
+    PAGE_SIZE = 50
+
+    def __init__(self):
+        self.playlists = {}  # playlist id -> video ids in order
+        self.durations = {}  # video id -> seconds
+        self.failures = {}  # resource -> (status, reason, successful calls before failing)
+        self.latency = {}  # resource -> seconds added to each response
+        self.calls = Counter()  # resource -> requests received
+        self.requests = []  # (resource, params, if_none_match, status, started, finished)
+        self.clients = 0
+
+    def add_playlist(self, playlist_id: str, videos: int):
+        video_ids = [f"{playlist_id}-{i}" for i in range(videos)]
+        self.playlists[playlist_id] = video_ids
+        self.durations.update({video_id: 60 * (i + 1) for i, video_id in enumerate(video_ids)})
+        return video_ids
+
+    def fail(self, resource: str, status: int, reason: str, after: int = 0):
+        self.failures[resource] = (status, reason, after)
+
+    def client(self):
+        self.clients += 1
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+    async def handle(self, request: httpx.Request):
+        resource = request.url.path.rsplit("/", 1)[-1]
+        started = time.monotonic()
+        await asyncio.sleep(self.latency.get(resource, 0))
+        response = self._respond(request)
+        self.requests.append((
+            resource, dict(request.url.params), request.headers.get("If-None-Match"),
+            response.status_code, started, time.monotonic(),
+        ))
+        return response
+
+    def _respond(self, request: httpx.Request):
+        resource = request.url.path.rsplit("/", 1)[-1]
+        params = request.url.params
+        self.calls[resource] += 1
+        status, reason, after = self.failures.get(resource, (None, None, 0))
+        if status and self.calls[resource] > after:
+            return httpx.Response(status, json={"error": {"errors": [{"reason": reason}]}})
+
+        if resource == "playlists":
+            playlist_id = params["id"]
+            items = [{"snippet": {
+                "title": f"Playlist {playlist_id}", "thumbnails": {"high": {"url": f"https://img/{playlist_id}"}},
+            }}] if playlist_id in self.playlists else []
+            body = {"items": items}
+        elif resource == "playlistItems":
+            video_ids = self.playlists.get(params["playlistId"])
+            if video_ids is None:
+                return httpx.Response(404, json={"error": {"errors": [{"reason": "playlistNotFound"}]}})
+            offset = int(params.get("pageToken") or 0)
+            page = video_ids[offset:offset + self.PAGE_SIZE]
+            body = {"items": [
+                {"snippet": {
+                    "resourceId": {"videoId": video_id}, "title": f"Video {video_id}",
+                    "thumbnails": {"high": {"url": f"https://img/{video_id}"}},
+                }}
+                for video_id in page
+            ]}
+            if offset + self.PAGE_SIZE < len(video_ids):
+                body["nextPageToken"] = str(offset + self.PAGE_SIZE)
+        elif resource == "videos":
+            body = {"items": [
+                {"id": video_id, "contentDetails": {"duration": f"PT{self.durations[video_id]}S"}}
+                for video_id in params["id"].split(",") if video_id in self.durations
+            ]}
+        else:
+            return httpx.Response(404)
+
+        content = json.dumps(body).encode()
+        tag = '"%s"' % hashlib.sha1(content).hexdigest()
+        if request.headers.get("If-None-Match") == tag:
+            return httpx.Response(304, headers={"ETag": tag})
+        return httpx.Response(200, content=content, headers={"ETag": tag, "Content-Type": "application/json"})
+
+
+@pytest.fixture
+def youtube(monkeypatch):
+    # Every client the app opens talks to one fake YouTube
+    fake = FakeYouTube()
+    monkeypatch.setattr(youtube_api, "create_http_client", lambda **kwargs: fake.client())
+    return fake
@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app import auth, hashing
+from app.main import app
+
+
+def _bcrypt_works():
+    try:
+        return hashing.verify_password("probe", hashing.hash_password("probe"))
+    except ValueError:  # passlib's backend probe fails on some bcrypt releases
+        return False
+
+
+def test_hashing_pool_starts_with_the_app_without_fork():
+    with TestClient(app):
+        pool = hashing._pool
+        assert pool is not None
+        assert pool._mp_context.get_start_method() != "fork"
+        assert pool.submit(os.getpid).result(timeout=60) != os.getpid()
+    assert hashing._pool is None
+
+
+@pytest.mark.skipif(not _bcrypt_works(), reason="passlib cannot drive the installed bcrypt")
+def test_concurrent_logins(client):
+    emails = [f"user{i}@example.com" for i in range(4)]
+    for email in emails:
+        assert client.post("/auth/register", json={"email": email, "password": "secret"}).status_code == 200
+
+    def login(i):
+        email = emails[i % len(emails)]
+        password = "secret" if i % 5 else "wrong"
+        response = client.post("/auth/login", data={"username": email, "password": password})
+        return email, password, response
+
+    with ThreadPoolExecutor(max_workers=16) as threads:
+        results = list(threads.map(login, range(64)))
+
+    for email, password, response in results:
+        if password == "wrong":
+            assert response.status_code == 401
+        else:
+            assert response.status_code == 200
+            claims = jwt.decode(response.json()["access_token"], auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            assert claims["email"] == email
@@ -0,0 +1,92 @@
+import random
+from array import array
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.calendar_logic import (
+    CapacityTimeline,
+    PlaylistLane,
+    hours_day_offsets,
+    schedule_by_target_date,
+    schedule_user_playlists,
+    target_day_offsets,
+)
+
+
+def _reference_min_max_load(durations, days):
+    # O(days * n^2) linear partition: best[k][i] is the smallest busiest day over the first i videos in k days
+    n = len(durations)
+    prefix = [0]
+    for duration in durations:
+        prefix.append(prefix[-1] + duration)
+    inf = float("inf")
+    best = [[inf] * (n + 1) for _ in range(days + 1)]
+    best[0][0] = 0
+    for k in range(1, days + 1):
+        for i in range(k, n + 1):
+            best[k][i] = min(max(best[k - 1][j], prefix[i] - prefix[j]) for j in range(k - 1, i))
+    return best[days][n]
+
+
+def _daily_loads(durations, offsets):
+    loads = [0] * (offsets[-1] + 1)
+    for duration, day in zip(durations, offsets):
+        loads[day] += duration
+    return loads
+
+
+def test_target_offsets_match_the_optimal_partition():
+    rnd = random.Random(16)
+    for _ in range(500):
+        durations = [rnd.choice([0, rnd.randint(1, 60), rnd.randint(60, 3600)]) for _ in range(rnd.randint(1, 14))]
+        total_days = rnd.randint(1, len(durations) + 3)
+        offsets = target_day_offsets(array("i", durations), total_days)
+        days = min(total_days, len(durations))
+        case = f"durations={durations} total_days={total_days} offsets={list(offsets)}"
+
+        assert len(offsets) == len(durations), case
+        assert offsets[0] == 0, case
+        # Contiguous days, none of them empty, exactly `days` of them
+        assert all(b - a in (0, 1) for a, b in zip(offsets, offsets[1:])), case
+        assert offsets[-1] == days - 1, case
+        assert max(_daily_loads(durations, offsets)) == _reference_min_max_load(durations, days), case
+
+
+def test_target_offsets_of_no_videos():
+    assert list(target_day_offsets(array("i"), 5)) == []
+
+
+def test_schedule_by_target_date_stays_within_the_range():
+    rnd = random.Random(1)
+    videos = [SimpleNamespace(id=i, duration_seconds=rnd.randint(60, 7200)) for i in range(500)]
+    start, end = datetime(2025, 1, 1), datetime(2025, 1, 30)
+    schedule = schedule_by_target_date(videos, end, start)
+
+    assert [video_id for video_id, _ in schedule] == list(range(500))
+    assert schedule[0][1] == start
+    assert schedule[-1][1] == end
+    assert all(start <= day <= end for _, day in schedule)
+
+
+@pytest.mark.parametrize("durations, limit, expected", [
+    ([10, 10, 10], 20, [0, 0, 1]),
+    ([30, 10], 20, [0, 1]),
+    ([5, 5, 5, 5], 100, [0, 0, 0, 0]),
+])
+def test_hours_offsets_fill_each_day_up_to_the_limit(durations, limit, expected):
+    assert list(hours_day_offsets(array("i", durations), limit)) == expected
+
+
+def test_deadline_lane_counts_blackouts_in_its_window():
+    # From Wednesday 2025-01-01 with Monday 01-06 (the longest day) off, exactly six hours are left before 01-08
+    timeline = CapacityTimeline(date(2025, 1, 1), [3, 0, 2, 1, 2, 0, 1], [date(2025, 1, 6)])
+    deadline = (date(2025, 1, 8) - timeline.start_date).days
+    assert timeline.capacity_between(0, deadline) == 6 * 3600
+    lanes = [
+        PlaylistLane(1, 1, deadline, [(i, 3600) for i in range(6)]),
+        PlaylistLane(2, 1, None, [(i, 3600) for i in range(6, 30)]),
+    ]
+    _, finish = schedule_user_playlists(lanes, timeline)
+    assert finish[1].date() <= date(2025, 1, 8)
@@ -0,0 +1,27 @@
+import pytest
+
+from app.response_cache import response_cache
+
+
+def test_dashboard_lists_every_playlist_of_the_user(client, seed):
+    seed(playlists=1, videos=2)
+    user = seed(playlists=3, videos=4, completed=1, scheduled=False)
+    dashboard = client.get("/calendar/user/me/dashboard", headers=user.headers).json()
+
+    assert [row["playlist_id"] for row in dashboard] == user.playlist_ids
+    assert all((row["total_videos"], row["completed"], row["percent_complete"]) == (4, 1, 25.0) for row in dashboard)
+    assert all(row["scheduled_start"] is None for row in dashboard)
+
+
+@pytest.mark.parametrize("playlists", [1, 25])
+def test_dashboard_statement_count_does_not_grow_with_playlists(client, seed, statements, playlists):
+    user = seed(playlists=playlists, videos=3)
+    # The first request also loads the user; count a second one, built again rather than served from the LRU
+    client.get("/calendar/user/me/dashboard", headers=user.headers)
+    response_cache.clear()
+    statements.clear()
+    response = client.get("/calendar/user/me/dashboard", headers=user.headers)
+
+    assert len(response.json()) == playlists
+    # Versions, then the grouped dashboard query
+    assert len(statements) == 2
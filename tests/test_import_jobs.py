@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from app import models
+from app.database import SessionLocal
+
+FINISHED = ("completed", "failed")
+
+
+def _import(client, user, youtube_id):
+    response = client.post("/playlists/import", json={"youtube_url": f"https://www.youtube.com/playlist?list={youtube_id}"},
+                           headers=user.headers)
+    assert response.status_code == 202
+    return response.json()
+
+
+def _wait(client, user, started, timeout=10.0):
+    # Polls the status endpoint; returns the finished job and every state seen on the way
+    states = [started["state"]]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(started["status_url"], headers=user.headers).json()
+        if job["state"] != states[-1]:
+            states.append(job["state"])
+        if job["state"] in FINISHED:
+            return job, states
+        time.sleep(0.01)
+    raise AssertionError(f"import still {states[-1]} after {timeout} s")
+
+
+def _stored_rows():
+    with SessionLocal() as db:
+        return db.query(models.Playlist).count(), db.query(models.Video).count()
+
+
+def test_import_goes_from_queued_to_completed(youtube, client, seed):
+    user = seed(playlists=0)
+    video_ids = youtube.add_playlist("PLdone", 120)
+    youtube.latency = {"playlistItems": 0.05, "videos": 0.05}
+
+    job, states = _wait(client, user, _import(client, user, "PLdone"))
+    assert states[0] == "queued" and "fetching" in states and states[-1] == "completed"
+    order = ["queued", "fetching", "inserting", "completed"]
+    assert states == sorted(states, key=order.index)
+    assert (job["pages_fetched"], job["videos_fetched"], job["videos_inserted"]) == (3, 120, 120)
+    assert job["playlist_title"] == "Playlist PLdone"
+
+    videos = client.get(f"/calendar/playlist/{job['playlist_id']}/videos", headers=user.headers).json()
+    assert [video["youtube_url"].rsplit("=", 1)[-1] for video in videos] == video_ids
+    watch_time = client.get(f"/calendar/playlist/{job['playlist_id']}/watch-time", headers=user.headers).json()
+    assert watch_time["total_time_sec"] == sum(youtube.durations[video_id] for video_id in video_ids)
+
+
+def test_missing_playlist_fails_the_job(youtube, client, seed):
+    user = seed(playlists=0)
+
+    job, states = _wait(client, user, _import(client, user, "PLmissing"))
+    assert states[-1] == "failed"
+    assert "404" in job["error"] and "playlistNotFound" in job["error"]
+    assert job["playlist_id"] is None
+    assert _stored_rows() == (0, 0)
+
+
+def test_empty_playlist_fails_the_job(youtube, client, seed):
+    user = seed(playlists=0)
+    youtube.add_playlist("PLempty", 0)
+
+    job, _ = _wait(client, user, _import(client, user, "PLempty"))
+    assert (job["state"], job["error"]) == ("failed", "No videos found")
+    assert _stored_rows() == (0, 0)
+
+
+@pytest.mark.parametrize("resource, status, reason", [
+    ("videos", 403, "quotaExceeded"),
+    ("playlistItems", 503, "backendError"),
+])
+def test_api_error_midway_leaves_no_partial_playlist(youtube, client, seed, resource, status, reason):
+    user = seed(playlists=0)
+    youtube.add_playlist("PLbroken", 150)
+    # The first request to the resource succeeds, a later one fails
+    youtube.fail(resource, status, reason, after=1)
+
+    job, _ = _wait(client, user, _import(client, user, "PLbroken"))
+    assert job["state"] == "failed"
+    assert str(status) in job["error"] and reason in job["error"]
+    assert job["videos_inserted"] == 0
+    assert _stored_rows() == (0, 0)
+
+
+def test_imports_share_one_client(youtube, client, seed):
+    user = seed(playlists=0)
+    for name in ("PLa", "PLb", "PLc"):
+        youtube.add_playlist(name, 60)
+
+    jobs = [_import(client, user, name) for name in ("PLa", "PLb", "PLc")]
+    assert all(_wait(client, user, job)[0]["state"] == "completed" for job in jobs)
+    # One client (one connection pool) was opened by the lifespan and every import used it
+    assert youtube.clients == 1
+    assert sum(youtube.calls.values()) == len(youtube.requests) == 3 * (1 + 2 + 2)
+    assert not client.app.state.http_client.is_closed
@@ -0,0 +1,62 @@
+import pytest
+
+
+def test_cross_origin_clients_can_read_the_cursor_and_validators(client, seed):
+    user = seed(playlists=1, videos=3)
+    response = client.get(
+        f"/calendar/playlist/{user.playlist_ids[0]}/videos?limit=2",
+        headers={**user.headers, "Origin": "https://app.example.com"},
+    )
+    exposed = {name.strip().lower() for name in response.headers["access-control-expose-headers"].split(",")}
+    assert {"x-next-cursor", "etag", "last-modified"} <= exposed
+    assert response.headers["x-next-cursor"]
+
+
+def test_video_pages_follow_the_cursor(client, seed):
+    user = seed(playlists=1, videos=5)
+    url = f"/calendar/playlist/{user.playlist_ids[0]}/videos?limit=2"
+    seen, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""), headers=user.headers)
+        seen += [video["id"] for video in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == user.video_ids
+
+
+def _calendar_ids(body):
+    return [video["id"] for day in body for video in day["videos"]]
+
+
+def test_calendar_pages_follow_the_cursor_across_shared_days(client, seed):
+    user = seed(playlists=1, videos=5)
+    playlist_id = user.playlist_ids[0]
+    # Two hours a day puts several videos on one day, so pages end in the middle of a day
+    client.post("/calendar/schedule/by-hours", json={
+        "playlist_id": playlist_id, "hours_per_day": 2, "start_date": "2025-01-06",
+    }, headers=user.headers)
+    url = f"/calendar/playlist/{playlist_id}/calendar-view"
+    everything = client.get(url, headers=user.headers).json()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, params=params, headers=user.headers)
+        assert response.status_code == 200
+        seen += _calendar_ids(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == _calendar_ids(everything) and sorted(seen) == user.video_ids
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "2025-01-06T00:00:00,x", "not-a-date,3", "2025-01-06T00:00:00"])
+def test_malformed_calendar_cursor_is_a_400(client, seed, cursor):
+    user = seed(playlists=1, videos=3)
+    response = client.get(
+        f"/calendar/playlist/{user.playlist_ids[0]}/calendar-view", params={"limit": 2, "cursor": cursor},
+        headers=user.headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,94 @@
+import time
+from types import SimpleNamespace
+
+from app.playlist_sync import diff_playlist, match_legacy_rows
+
+
+def _row(id, catalog_id, position, title=None):
+    return SimpleNamespace(id=id, catalog_id=catalog_id, position=position, title=title)
+
+
+def _item(video_id, title):
+    return {"video_id": video_id, "title": title}
+
+
+def test_diff_of_an_unchanged_playlist_is_empty():
+    existing = [_row(1, "a", 0), _row(2, "b", 1), _row(3, "c", 2)]
+    assert diff_playlist(existing, ["a", "b", "c"]) == ([], [], [])
+
+
+def test_diff_inserts_deletes_and_moves():
+    existing = [_row(1, "a", 0), _row(2, "b", 1), _row(3, "c", 2)]
+    inserts, deletes, moves = diff_playlist(existing, ["c", "a", "d"])
+    assert inserts == [(2, "d")]
+    assert deletes == [2]
+    assert moves == [(3, 0), (1, 1)]
+
+
+def test_diff_matches_duplicates_in_playlist_order():
+    # Position ties and missing positions fall back to the row id
+    existing = [_row(5, "a", 2), _row(1, "a", 0), _row(2, "b", None), _row(4, "a", 2)]
+    inserts, deletes, moves = diff_playlist(existing, ["b", "a", "a"])
+    assert inserts == []
+    assert deletes == [5]
+    assert moves == [(2, 0), (1, 1)]
+
+
+def test_legacy_rows_are_relinked_by_title_in_order():
+    existing = [
+        _row(1, "a", 0, "Intro"),
+        _row(2, "legacy-2", 1, "Lesson"),
+        _row(3, None, 2, "  lesson "),
+        _row(4, "legacy-4", 3, "Gone"),
+    ]
+    remote = [_item("a", "Intro"), _item("x", "Lesson"), _item("y", "LESSON"), _item("z", "New")]
+    relinks, unmatched = match_legacy_rows(existing, remote)
+    assert relinks == [(2, "x"), (3, "y")]
+    assert unmatched == [4]
+
+
+def test_stored_ids_are_not_offered_to_legacy_rows():
+    # The remote "a" is already stored once; only its second copy is free
+    existing = [_row(1, "a", 0, "Same"), _row(2, "legacy-2", 1, "Same"), _row(3, "legacy-3", 2, "Same")]
+    relinks, unmatched = match_legacy_rows(existing, [_item("a", "Same"), _item("a", "Same")])
+    assert relinks == [(2, "a")]
+    assert unmatched == [3]
+
+
+def _import(client, user, youtube_id):
+    started = client.post("/playlists/import", json={"youtube_url": youtube_id}, headers=user.headers).json()
+    for _ in range(500):
+        job = client.get(started["status_url"], headers=user.headers).json()
+        if job["state"] == "completed":
+            return job["playlist_id"]
+        time.sleep(0.01)
+    raise AssertionError(f"import ended {job['state']}")
+
+
+def test_sync_reports_new_videos_a_user_plan_leaves_unscheduled(youtube, client, seed):
+    user = seed(playlists=0)
+    youtube.add_playlist("PLuser", 3)
+    youtube.add_playlist("PLhours", 3)
+    user_plan = _import(client, user, "PLuser")
+    hours_plan = _import(client, user, "PLhours")
+    client.post("/calendar/user/me/schedule", json={
+        "start_date": "2025-01-06", "hours_per_day": 1, "playlists": [{"playlist_id": user_plan}],
+    }, headers=user.headers)
+    client.post("/calendar/schedule/by-hours", json={
+        "playlist_id": hours_plan, "hours_per_day": 1, "start_date": "2025-01-06",
+    }, headers=user.headers)
+
+    youtube.add_playlist("PLuser", 4)
+    youtube.add_playlist("PLhours", 4)
+    synced = client.post(f"/playlists/{user_plan}/sync", headers=user.headers).json()
+    assert (synced["inserted"], synced["unscheduled"]) == (1, 1)
+    synced = client.post(f"/playlists/{hours_plan}/sync", headers=user.headers).json()
+    assert (synced["inserted"], synced["unscheduled"]) == (1, 0)
+
+    dates = {
+        playlist_id: [video["scheduled_date"] for video in client.get(
+            f"/calendar/playlist/{playlist_id}/videos", headers=user.headers).json()]
+        for playlist_id in (user_plan, hours_plan)
+    }
+    assert dates[user_plan][-1] is None and all(dates[user_plan][:-1])
+    assert all(dates[hours_plan])
@@ -0,0 +1,103 @@
+import asyncio
+import random
+
+from sqlalchemy import func, select
+
+from app import crud, models
+from app.database import AsyncSessionLocal
+from app.progress import apply_video_updates
+from app.rebuild_stats import rebuild
+from app.write_behind import PendingUpdate
+
+STATUSES = ["Not Started", "In Progress", crud.COMPLETED]
+
+
+async def _stored_and_real(playlist_id):
+    async with AsyncSessionLocal() as db:
+        stats = (await db.execute(
+            select(models.PlaylistStats.completed_videos, models.PlaylistStats.completed_seconds)
+            .where(models.PlaylistStats.playlist_id == playlist_id)
+        )).one()
+        real = (await db.execute(
+            select(func.count(), func.coalesce(func.sum(models.Video.duration_seconds), 0))
+            .where(models.Video.playlist_id == playlist_id, models.Video.status == crud.COMPLETED)
+        )).one()
+    return tuple(stats), tuple(real)
+
+
+def test_concurrent_status_toggles_keep_counters_consistent(seed):
+    user = seed(playlists=1, videos=5, completed=2)
+    playlist_id = user.playlist_ids[0]
+    videos = user.video_ids[:3]
+
+    async def toggle(i):
+        rnd = random.Random(i)
+        item = PendingUpdate(rnd.choice(videos), user.id, playlist_id, rnd.choice(STATUSES), None)
+        # Concurrent writers may still time out on the SQLite write lock: retry like a client would
+        for _ in range(50):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await apply_video_updates(db, user.id, [item])
+                    await db.commit()
+                return
+            except Exception:
+                await asyncio.sleep(0.01)
+        raise AssertionError("update never committed")
+
+    async def run():
+        await asyncio.gather(*[toggle(i) for i in range(200)])
+        return await _stored_and_real(playlist_id)
+
+    stored, real = asyncio.run(run())
+    assert stored == real
+    assert asyncio.run(rebuild(check_only=True))[1] == []
+
+
+def test_toggle_within_one_batch_counts_the_net_change(seed):
+    user = seed(playlists=1, videos=3)
+    playlist_id = user.playlist_ids[0]
+    video_id = user.video_ids[0]
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            results = await apply_video_updates(db, user.id, [
+                PendingUpdate(video_id, user.id, playlist_id, crud.COMPLETED, None),
+                PendingUpdate(video_id, user.id, playlist_id, "Not Started", "later"),
+            ])
+            await db.commit()
+        return results, await _stored_and_real(playlist_id)
+
+    results, (stored, real) = asyncio.run(run())
+    assert [r["status"] for r in results] == [crud.COMPLETED, "Not Started"]
+    assert results[1]["notes"] == "later"
+    assert stored == real == (0, 0)
+
+
+def test_updates_skip_videos_of_other_users(seed):
+    owner = seed(playlists=1, videos=2)
+    other = seed(playlists=1, videos=2)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            results = await apply_video_updates(db, other.id, [
+                PendingUpdate(owner.video_ids[0], other.id, other.playlist_ids[0], crud.COMPLETED, None),
+            ])
+            await db.commit()
+        return results, await _stored_and_real(owner.playlist_ids[0])
+
+    results, (stored, real) = asyncio.run(run())
+    assert results == [{"id": owner.video_ids[0], "updated": False, "error": "Video not found"}]
+    assert stored == real == (0, 0)
+
+
+def test_put_video_moves_progress(client, seed):
+    user = seed(playlists=1, videos=4)
+    playlist_id = user.playlist_ids[0]
+
+    for video_id in user.video_ids[:3]:
+        assert client.put(f"/calendar/video/{video_id}", json={"status": crud.COMPLETED}, headers=user.headers).status_code == 200
+    client.put(f"/calendar/video/{user.video_ids[0]}", json={"status": "In Progress"}, headers=user.headers)
+
+    progress = client.get(f"/calendar/playlist/{playlist_id}/progress", headers=user.headers).json()
+    assert progress["completed"] == 2
+    assert progress["total_videos"] == 4
@@ -0,0 +1,36 @@
+import sqlite3
+
+import pytest
+
+from tests.conftest import DB_PATH
+
+ENDPOINTS = [
+    "/calendar/playlist/{playlist_id}",
+    "/calendar/playlist/{playlist_id}/videos",
+    "/calendar/playlist/{playlist_id}/progress",
+    "/calendar/playlist/{playlist_id}/watch-time",
+    "/calendar/playlist/{playlist_id}/chart-data",
+    "/calendar/playlist/{playlist_id}/streak",
+    "/calendar/playlist/{playlist_id}/calendar-view",
+    "/calendar/user/me/dashboard",
+    "/calendar/user/me/streak",
+]
+
+
+def _query_plan(statement, parameters):
+    with sqlite3.connect(DB_PATH) as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_calendar_reads_never_scan_a_table(client, seed, statements, endpoint):
+    user = seed(playlists=3, videos=20, completed=5)
+    statements.clear()
+    response = client.get(endpoint.format(playlist_id=user.playlist_ids[1]), headers=user.headers)
+    assert response.status_code == 200
+
+    selects = [(s, p) for s, p, executemany in statements if s.lstrip().upper().startswith("SELECT") and not executemany]
+    assert selects
+    for statement, parameters in selects:
+        scans = [step for step in _query_plan(statement, parameters) if step.startswith("SCAN")]
+        assert not scans, f"{scans} in:\n{statement}"
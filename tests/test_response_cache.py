@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from app import crud
+from app.database import AsyncSessionLocal
+from app.response_cache import etag_matches
+from app.write_behind import write_behind
+
+READS = ["videos", "calendar-view", "progress"]
+
+
+def _url(playlist_id, endpoint):
+    return f"/calendar/playlist/{playlist_id}/{endpoint}"
+
+
+def _get(client, user, url, tag=None):
+    headers = dict(user.headers)
+    if tag:
+        headers["If-None-Match"] = tag
+    return client.get(url, headers=headers)
+
+
+@pytest.mark.parametrize("endpoint", READS)
+def test_matching_etag_is_answered_with_304_without_reading_videos(client, seed, statements, endpoint):
+    user = seed(playlists=1, videos=5)
+    url = _url(user.playlist_ids[0], endpoint)
+    first = _get(client, user, url)
+    assert first.headers["etag"]
+    assert first.headers["last-modified"].endswith("GMT")
+
+    statements.clear()
+    response = _get(client, user, url, first.headers["etag"])
+    assert response.status_code == 304
+    assert response.content == b""
+    assert not any("FROM videos" in statement for statement, _, _ in statements)
+
+
+@pytest.mark.parametrize("endpoint", READS)
+def test_status_change_invalidates(client, seed, endpoint):
+    user = seed(playlists=1, videos=5)
+    url = _url(user.playlist_ids[0], endpoint)
+    tag = _get(client, user, url).headers["etag"]
+
+    client.put(f"/calendar/video/{user.video_ids[2]}", json={"status": "Completed"}, headers=user.headers)
+    response = _get(client, user, url, tag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != tag
+
+
+def test_notes_only_and_batch_updates_invalidate_the_video_list(client, seed):
+    user = seed(playlists=1, videos=5)
+    url = _url(user.playlist_ids[0], "videos")
+
+    tag = _get(client, user, url).headers["etag"]
+    client.put(f"/calendar/video/{user.video_ids[0]}", json={"status": "Not Started", "notes": "hello"}, headers=user.headers)
+    response = _get(client, user, url, tag)
+    assert response.status_code == 200
+    assert response.json()[0]["notes"] == "hello"
+
+    tag = response.headers["etag"]
+    client.patch("/calendar/videos", json=[{"id": user.video_ids[1], "notes": "x"}], headers=user.headers)
+    assert _get(client, user, url, tag).status_code == 200
+
+
+def test_schedule_invalidates_the_calendar_view(client, seed):
+    user = seed(playlists=1, videos=5)
+    playlist_id = user.playlist_ids[0]
+    url = _url(playlist_id, "calendar-view")
+    tag = _get(client, user, url).headers["etag"]
+
+    client.post("/calendar/schedule/by-hours", json={
+        "playlist_id": playlist_id, "hours_per_day": 0.5, "start_date": "2025-02-01",
+    }, headers=user.headers)
+    response = _get(client, user, url, tag)
+    assert response.status_code == 200
+    assert response.json()[0]["date"] == "2025-02-01"
+
+
+def test_writes_to_another_playlist_keep_the_etag(client, seed):
+    user = seed(playlists=2, videos=3)
+    url = _url(user.playlist_ids[1], "videos")
+    tag = _get(client, user, url).headers["etag"]
+
+    client.put(f"/calendar/video/{user.video_ids[0]}", json={"status": "Completed"}, headers=user.headers)
+    assert _get(client, user, url, tag).status_code == 304
+
+
+def test_dashboard_changes_with_any_playlist(client, seed):
+    user = seed(playlists=2, videos=3)
+    url = "/calendar/user/me/dashboard"
+    tag = _get(client, user, url).headers["etag"]
+    assert _get(client, user, url, tag).status_code == 304
+
+    client.put(f"/calendar/video/{user.video_ids[-1]}", json={"status": "Completed"}, headers=user.headers)
+    assert _get(client, user, url, tag).status_code == 200
+
+
+def test_query_parameters_are_part_of_the_etag(client, seed):
+    user = seed(playlists=1, videos=5)
+    url = _url(user.playlist_ids[0], "videos")
+    tag = _get(client, user, url).headers["etag"]
+    assert _get(client, user, url + "?limit=2").headers["etag"] != tag
+    assert _get(client, user, url + "?limit=2", tag).status_code == 200
+
+
+def test_pending_write_behind_changes_are_served_without_an_etag(client, seed, monkeypatch):
+    user = seed(playlists=1, videos=5)
+    playlist_id = user.playlist_ids[0]
+    url = _url(playlist_id, "videos")
+    tag = _get(client, user, url).headers["etag"]
+    monkeypatch.setattr(write_behind, "enabled", True)
+
+    client.put(f"/calendar/video/{user.video_ids[4]}", json={"status": "In Progress"}, headers=user.headers)
+    response = _get(client, user, url, tag)
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert response.json()[4]["status"] == "In Progress"
+
+    # Aggregate reads flush the playlist first, after which a new validator is issued
+    _get(client, user, _url(playlist_id, "progress"))
+    response = _get(client, user, url, tag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != tag
+
+
+def test_stats_refresh_and_import_set_the_version():
+    async def run():
+        async with AsyncSessionLocal() as db:
+            playlist = await crud.create_imported_playlist(db, None, "u", "yt", {
+                "playlist": {"title": "t", "thumbnail": "t"},
+                "videos": [{"video_id": "v1", "title": "v", "thumbnail": "t", "youtube_url": "u", "duration_seconds": 60}],
+            })
+            imported = (await crud.playlist_version(db, playlist.id)).version
+            await crud.refresh_playlist_stats(db, [playlist.id])
+            await db.commit()
+            return imported, (await crud.playlist_version(db, playlist.id)).version
+
+    assert asyncio.run(run()) == (1, 2)
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ("", False),
+])
+def test_etag_matching(header, matches):
+    assert etag_matches(header, '"abc"') is matches
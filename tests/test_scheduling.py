@@ -0,0 +1,80 @@
+from datetime import date
+
+BLACKOUT = "2025-01-07"
+
+
+def _scheduled_dates(client, user, playlist_id):
+    videos = client.get(f"/calendar/playlist/{playlist_id}/videos", headers=user.headers).json()
+    return {video["id"]: video["scheduled_date"] for video in videos}
+
+
+def _set_availability(client, user):
+    # One hour Monday to Friday, nothing at the weekend, Tuesday 2025-01-07 off
+    response = client.put("/calendar/user/me/availability", json={
+        "weekday_hours": [1, 1, 1, 1, 1, 0, 0], "blackout_dates": [BLACKOUT],
+    }, headers=user.headers)
+    assert response.status_code == 200
+
+
+def _assert_on_study_days(dates):
+    for value in dates.values():
+        day = date.fromisoformat(value[:10])
+        assert day.weekday() < 5, value
+        assert day.isoformat() != BLACKOUT, value
+
+
+def test_reschedule_remaining_survives_a_user_reschedule(client, seed):
+    user = seed(playlists=1, videos=5)
+    playlist_id = user.playlist_ids[0]
+    client.post("/calendar/schedule/by-hours", json={
+        "playlist_id": playlist_id, "hours_per_day": 2, "start_date": "2025-01-04",
+    }, headers=user.headers)
+    _set_availability(client, user)
+
+    response = client.post(f"/calendar/playlist/{playlist_id}/reschedule-remaining?start_date=2025-01-04", headers=user.headers)
+    assert response.status_code == 200
+    planned = _scheduled_dates(client, user, playlist_id)
+    _assert_on_study_days(planned)
+
+    # A replay of the saved plans must rebuild from the availability, not the old hours/day plan
+    assert client.post("/calendar/user/me/reschedule", headers=user.headers).status_code == 200
+    assert _scheduled_dates(client, user, playlist_id) == planned
+
+
+def test_capacity_replay_follows_new_availability(client, seed):
+    user = seed(playlists=1, videos=3)
+    playlist_id = user.playlist_ids[0]
+    _set_availability(client, user)
+    client.post(f"/calendar/playlist/{playlist_id}/reschedule-remaining?start_date=2025-01-06", headers=user.headers)
+
+    client.put("/calendar/user/me/availability", json={"weekday_hours": [0, 0, 0, 0, 0, 5, 5]}, headers=user.headers)
+    client.post("/calendar/user/me/reschedule", headers=user.headers)
+    dates = _scheduled_dates(client, user, playlist_id)
+    assert {date.fromisoformat(value[:10]).weekday() for value in dates.values()} <= {5, 6}
+
+
+def test_completed_videos_keep_their_date_on_replay(client, seed):
+    user = seed(playlists=1, videos=4, completed=1)
+    playlist_id = user.playlist_ids[0]
+    before = _scheduled_dates(client, user, playlist_id)
+    _set_availability(client, user)
+    client.post(f"/calendar/playlist/{playlist_id}/reschedule-remaining?start_date=2025-03-03", headers=user.headers)
+    client.post("/calendar/user/me/reschedule", headers=user.headers)
+
+    after = _scheduled_dates(client, user, playlist_id)
+    assert after[user.video_ids[0]] == before[user.video_ids[0]]
+    assert all(after[video_id] >= "2025-03-03" for video_id in user.video_ids[1:])
+
+
+def test_user_schedule_rejects_an_empty_or_repeated_plan(client, seed):
+    user = seed(playlists=2, videos=2)
+    first, second = user.playlist_ids
+
+    def schedule(plans):
+        return client.post("/calendar/user/me/schedule", json={
+            "start_date": "2025-01-06", "hours_per_day": 1, "playlists": plans,
+        }, headers=user.headers)
+
+    assert schedule([]).status_code == 422
+    assert schedule([{"playlist_id": first}, {"playlist_id": first, "weight": 2}]).status_code == 422
+    assert schedule([{"playlist_id": first}, {"playlist_id": second}]).status_code == 200
@@ -0,0 +1,14 @@
+def test_playlist_stats_endpoints_agree(client, seed):
+    # Durations are 600, 1200, ... seconds; the first two videos are completed
+    user = seed(playlists=1, videos=5, completed=2)
+    playlist_id = user.playlist_ids[0]
+
+    def get(path):
+        return client.get(f"/calendar/playlist/{playlist_id}{path}", headers=user.headers).json()
+
+    assert get("/progress") == {"playlist_id": playlist_id, "total_videos": 5, "completed": 2, "percentage": 40.0}
+    assert get("/watch-time") == {"total_time_sec": 9000, "completed_sec": 1800, "remaining_sec": 7200}
+    assert get("/chart-data") == {"total_videos": 5, "completed_videos": 2}
+    details = get("")
+    assert (details["completed"], details["percent_complete"]) == (2, 40.0)
+    assert (details["scheduled_start"], details["scheduled_end"]) == ("2025-01-01", "2025-01-05")
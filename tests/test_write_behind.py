@@ -0,0 +1,70 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app import progress
+from app.main import app
+from app.write_behind import write_behind
+
+
+def _wait_for_flush(timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while write_behind.has_pending() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return not write_behind.has_pending()
+
+
+def test_flusher_runs_in_every_lifespan(seed, monkeypatch):
+    user = seed(playlists=1, videos=3)
+    monkeypatch.setattr(write_behind, "enabled", True)
+    monkeypatch.setattr(write_behind, "interval", 0.05)
+
+    # Each TestClient runs the lifespan on a new event loop, like a reload in one process
+    for status in ("In Progress", "Completed"):
+        with TestClient(app) as client:
+            response = client.put(f"/calendar/video/{user.video_ids[0]}", json={"status": status}, headers=user.headers)
+            assert response.status_code == 200
+            assert _wait_for_flush()
+            videos = client.get(f"/calendar/playlist/{user.playlist_ids[0]}/videos", headers=user.headers).json()
+            assert videos[0]["status"] == status
+    assert write_behind.failed_flushes == 0
+
+
+def test_failed_flush_keeps_the_flusher_running(seed, monkeypatch):
+    user = seed(playlists=1, videos=3)
+    monkeypatch.setattr(write_behind, "enabled", True)
+    monkeypatch.setattr(write_behind, "interval", 0.05)
+    failures = iter([RuntimeError("database is locked")])
+    flush = write_behind.flush
+
+    async def flaky_flush(playlist_ids=None):
+        failure = next(failures, None)
+        if failure is not None and playlist_ids is None:
+            raise failure
+        return await flush(playlist_ids)
+
+    monkeypatch.setattr(write_behind, "flush", flaky_flush)
+    with TestClient(app) as client:
+        client.put(f"/calendar/video/{user.video_ids[1]}", json={"status": "Completed"}, headers=user.headers)
+        assert _wait_for_flush()
+
+
+def test_changes_stay_visible_until_their_flush_commits(seed, monkeypatch):
+    user = seed(playlists=1, videos=3)
+    playlist_id, video_id = user.playlist_ids[0], user.video_ids[0]
+    monkeypatch.setattr(write_behind, "enabled", True)
+    seen = []
+    apply = progress.apply_video_updates
+
+    async def observed_apply(db, user_id, updates):
+        # Taken from the buffer but not committed: readers must still get the new values
+        item = write_behind.overlay({"id": video_id, "status": "Not Started"})
+        seen.append((item["status"], write_behind.has_pending(playlist_id)))
+        return await apply(db, user_id, updates)
+
+    monkeypatch.setattr(progress, "apply_video_updates", observed_apply)
+    with TestClient(app) as client:
+        client.put(f"/calendar/video/{video_id}", json={"status": "Completed"}, headers=user.headers)
+        assert client.get(f"/calendar/playlist/{playlist_id}/progress", headers=user.headers).json()["completed"] == 1
+    assert seen == [("Completed", True)]
+    assert not write_behind.has_pending()
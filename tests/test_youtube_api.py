@@ -0,0 +1,34 @@
+import asyncio
+
+from app import youtube_api
+
+
+def _max_overlap(intervals):
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    busiest = current = 0
+    for _, step in events:
+        current += step
+        busiest = max(busiest, current)
+    return busiest
+
+
+def test_duration_chunks_overlap_page_fetches_within_the_limit(youtube, monkeypatch):
+    monkeypatch.setattr(youtube_api, "MAX_CONCURRENT_REQUESTS", 3)
+    video_ids = youtube.add_playlist("PLslow", 300)
+    # Duration lookups are slower than pages, so without the limiter they would pile up
+    youtube.latency = {"playlistItems": 0.02, "videos": 0.2}
+
+    async def fetch():
+        async with youtube.client() as client:
+            return await youtube_api.get_playlist_videos("PLslow", client)
+
+    data = asyncio.run(fetch())
+    assert [video["video_id"] for video in data["videos"]] == video_ids
+
+    pages = [(started, finished) for resource, *_, started, finished in youtube.requests if resource == "playlistItems"]
+    chunks = [(started, finished) for resource, *_, started, finished in youtube.requests if resource == "videos"]
+    assert (len(pages), len(chunks)) == (6, 6)
+    # Each chunk is sent as soon as its page arrives, while the next pages are still being fetched
+    assert sum(1 for started, _ in chunks if started < pages[-1][0]) >= 4
+    # Pages and chunks share the limiter (the single metadata request is outside it) and fill it
+    assert _max_overlap(pages + chunks) == 3
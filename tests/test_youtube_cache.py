@@ -0,0 +1,122 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app import models, youtube_api
+from app.database import SessionLocal
+from app.youtube_cache import YouTubeAPIError, youtube_cache
+
+
+def _entries():
+    with SessionLocal() as db:
+        return {entry.key: entry for entry in db.query(models.YouTubeCacheEntry)}
+
+
+def _expire(key, ago):
+    with SessionLocal() as db:
+        db.get(models.YouTubeCacheEntry, key).expires_at = datetime.utcnow() - ago
+        db.commit()
+
+
+def test_unchanged_pages_revalidate_with_an_empty_304(youtube):
+    youtube.add_playlist("PLsame", 80)
+
+    async def list_twice():
+        async with youtube.client() as client:
+            return [await youtube_api.get_playlist_items("PLsame", client) for _ in range(2)]
+
+    first, second = asyncio.run(list_twice())
+    assert first == second and len(first) == 80
+    # Two pages each way: a 200 with an ETag, then If-None-Match answered by a bodiless 304
+    assert [(if_none_match is not None, status) for _, _, if_none_match, status, *_ in youtube.requests] == [
+        (False, 200), (False, 200), (True, 304), (True, 304),
+    ]
+    assert youtube_cache.stats()["revalidated"] == 2
+
+
+def test_expired_entry_is_revalidated_and_refreshed(youtube):
+    youtube.add_playlist("PLold", 10)
+    key = "playlistItems:PLold:"
+
+    async def list_items():
+        async with youtube.client() as client:
+            return await youtube_api.get_playlist_videos("PLold", client)
+
+    asyncio.run(list_items())
+    etag = _entries()[key].etag
+    assert etag
+
+    # Fresh: served from the table without asking YouTube
+    asyncio.run(list_items())
+    assert youtube.calls["playlistItems"] == 1
+
+    _expire(key, timedelta(minutes=1))
+    asyncio.run(list_items())
+    pages = [request for request in youtube.requests if request[0] == "playlistItems"]
+    assert [(if_none_match, status) for _, _, if_none_match, status, *_ in pages] == [(None, 200), (etag, 304)]
+    assert _entries()[key].expires_at > datetime.utcnow()
+
+
+def test_changed_page_replaces_the_entry(youtube):
+    youtube.add_playlist("PLedit", 3)
+    key = "playlistItems:PLedit:"
+
+    async def list_items():
+        async with youtube.client() as client:
+            return await youtube_api.get_playlist_items("PLedit", client)
+
+    asyncio.run(list_items())
+    etag = _entries()[key].etag
+    youtube.add_playlist("PLedit", 4)
+    assert len(asyncio.run(list_items())) == 4
+    assert _entries()[key].etag != etag
+
+
+def test_304_without_a_cached_entry_is_an_error():
+    async def fetch():
+        transport = httpx.MockTransport(lambda request: httpx.Response(304))
+        async with httpx.AsyncClient(transport=transport) as client:
+            await youtube_cache.get_json(client, "playlists:PLnone", youtube_api.YOUTUBE_PLAYLIST_METADATA_URL, {"id": "PLnone"})
+
+    with pytest.raises(YouTubeAPIError) as error:
+        asyncio.run(fetch())
+    assert error.value.status_code == 304
+    assert "playlists:PLnone" not in _entries()
+
+
+def _store_aged_entries():
+    now = datetime.utcnow()
+    asyncio.run(youtube_cache._store([
+        {"key": "old", "body": "{}", "fetched_at": now, "expires_at": now - youtube_cache.retention - timedelta(hours=1)},
+        {"key": "stale", "body": "{}", "fetched_at": now, "expires_at": now - timedelta(hours=1)},
+        {"key": "fresh", "body": "{}", "fetched_at": now, "expires_at": now + timedelta(hours=1)},
+    ]))
+
+
+def test_purge_keeps_entries_within_the_retention():
+    _store_aged_entries()
+    assert asyncio.run(youtube_cache.purge()) == 1
+    # Expired but still useful for its ETag
+    assert set(_entries()) == {"stale", "fresh"}
+
+    _store_aged_entries()
+    assert asyncio.run(youtube_cache.purge_if_due()) == 0  # purged moments ago
+    assert "old" in _entries()
+
+
+def test_import_start_purges_the_cache(youtube, client, seed):
+    user = seed(playlists=0)
+    youtube.add_playlist("PLnew", 5)
+    _store_aged_entries()
+
+    response = client.post("/playlists/import", json={"youtube_url": "PLnew"}, headers=user.headers)
+    status_url = response.json()["status_url"]
+    for _ in range(500):
+        if client.get(status_url, headers=user.headers).json()["state"] == "completed":
+            break
+        time.sleep(0.01)
+    assert "old" not in _entries() and "stale" in _entries()
+    assert youtube_cache.stats()["purged"] == 1